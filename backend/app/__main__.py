@@ -0,0 +1,28 @@
+"""Production launcher: ``python -m app``.
+
+Prefers uvloop and httptools (both shipped with ``uvicorn[standard]``) over the
+pure-Python asyncio loop and h11 parser. uvloop has no Windows build, so the
+launcher falls back to the stock implementations when either is missing.
+"""
+
+from importlib.util import find_spec
+
+import uvicorn
+
+from app.config import get_settings
+
+
+def main() -> None:
+    settings = get_settings()
+    uvicorn.run(
+        "app.main:app",
+        host=settings.server_host,
+        port=settings.server_port,
+        workers=settings.server_workers,
+        loop="uvloop" if find_spec("uvloop") else "asyncio",
+        http="httptools" if find_spec("httptools") else "h11",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,26 @@
 JWT Authentication and Authorization Module
 
 Provides:
-- Bcrypt password hashing and verification
+- Argon2id password hashing and verification (legacy bcrypt hashes still verify)
 - JWT token generation and verification
 - FastAPI middleware for protected routes
 - User extraction from tokens
 """
 
-from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Union, Callable, Awaitable
+import base64
+import hashlib
+import hmac
 import jwt
+import orjson
 import bcrypt
 import logging
+import os
+import time
+import anyio.to_thread
+from anyio import CapacityLimiter
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError, VerifyMismatchError
 
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer
@@ -22,40 +31,169 @@ from app.config import get_settings
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# JWT settings captured once at import so the hot path is a plain global read
+_JWT_SECRET = settings.jwt_secret_key
+_JWT_ALG = settings.jwt_algorithm
+_JWT_ALGS = [_JWT_ALG]
+_JWT_EXP_SECS = settings.jwt_exp_hours * 3600
+_JWT_CACHE_TTL = settings.jwt_cache_ttl_seconds
+_JWT_CACHE_MAX = settings.jwt_cache_max_entries
+# Rejections stay short-lived: a token that is not valid *yet* (nbf) can become valid
+_JWT_ERROR_CACHE_TTL = min(_JWT_CACHE_TTL, 5)
+
+
+def _load_pem(value: Optional[str], name: str) -> str:
+    if not value:
+        raise RuntimeError(f"JWT_ALGORITHM={_JWT_ALG} requires {name} to be set in backend/.env")
+    # .env files usually hold PEM keys on one line with escaped newlines
+    return value.replace("\\n", "\n")
+
+
+def _build_signing_key() -> Any:
+    """HMAC algorithms sign with the shared secret; asymmetric ones (e.g. EdDSA) with a private key."""
+    if _JWT_ALG.startswith("HS"):
+        return _JWT_SECRET
+    algorithm = jwt.get_algorithm_by_name(_JWT_ALG)
+    return algorithm.prepare_key(_load_pem(settings.jwt_private_key, "JWT_PRIVATE_KEY"))
+
+
+def _build_verify_key() -> Any:
+    """
+    Prepare the verification key once.
+
+    PyJWT re-runs HMAC key preparation (bytes coercion plus PEM/SSH checks)
+    on every decode when given a plain string; a PyJWK carries the prepared
+    key so decode goes straight to the OpenSSL-backed HMAC compare. Public
+    keys for asymmetric algorithms are likewise parsed from PEM only once.
+    """
+    if not _JWT_ALG.startswith("HS"):
+        algorithm = jwt.get_algorithm_by_name(_JWT_ALG)
+        return algorithm.prepare_key(_load_pem(settings.jwt_public_key, "JWT_PUBLIC_KEY"))
+    k = base64.urlsafe_b64encode(_JWT_SECRET.encode()).rstrip(b"=").decode()
+    return jwt.PyJWK({"kty": "oct", "k": k}, algorithm=_JWT_ALG)
+
+
+_JWT_SIGNING_KEY = _build_signing_key()
+_JWT_VERIFY_KEY = _build_verify_key()
+_JWT_KEY_BYTES = _JWT_SECRET.encode()
+
 # Security scheme for Swagger docs
 security = HTTPBearer()
 
+# Short-lived cache of verification results keyed by the raw token string.
+# Values are (expires_at, payload_or_error) so rejected tokens are cached too.
+_TOKEN_CACHE: Dict[str, Tuple[float, Union[Dict[str, Any], Tuple[int, str]]]] = {}
+
+# Auth errors are cached as (status_code, detail) only: raising mutates an
+# exception's traceback and context, so every raise builds a fresh HTTPException.
+_EXPIRED = (401, "Token has expired")
+_INVALID = (401, "Invalid authentication token")
+
 
 # ============================================================================
-# PASSWORD HASHING (Bcrypt)
+# PASSWORD HASHING (Argon2id, with legacy Bcrypt verification)
 # ============================================================================
 
-def hash_password(password: str) -> str:
+# Single hasher so the cost parameters are parsed once
+_HASHER = PasswordHasher(
+    time_cost=settings.argon2_time_cost,
+    memory_cost=settings.argon2_memory_cost,
+    parallelism=settings.argon2_parallelism,
+)
+
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+_BCRYPT_PREFIXES_BYTES = tuple(prefix.encode() for prefix in _BCRYPT_PREFIXES)
+
+def hash_password(password: Union[str, bytes]) -> str:
     """
-    Hash a password using bcrypt.
+    Hash a password using Argon2id.
     
     Args:
-        password: Plain text password
+        password: Plain text password (str, or already UTF-8 encoded bytes)
         
     Returns:
-        Hashed password (bcrypt hash)
+        Hashed password (Argon2id hash in PHC string format)
         
     Example:
         >>> hashed = hash_password("mypassword123")
-        >>> # $2b$12$... (bcrypt hash)
+        >>> # $argon2id$v=19$m=65536,t=2,p=1$... (argon2 hash)
     """
-    # Use 10 rounds for bcrypt (cost factor)
-    salt = bcrypt.gensalt(rounds=10)
-    return bcrypt.hashpw(password.encode(), salt).decode()
+    return _HASHER.hash(password)
 
 
-def verify_password(password: str, hashed: str) -> bool:
+def needs_rehash(hashed: str) -> bool:
     """
-    Verify a password against its bcrypt hash.
+    Check whether a stored hash should be regenerated.
+    
+    Legacy bcrypt hashes always need a rehash (migration to Argon2id);
+    Argon2 hashes need one when their parameters differ from settings.
     
     Args:
-        password: Plain text password to verify
-        hashed: Bcrypt hash to check against
+        hashed: Stored password hash
+        
+    Returns:
+        True if the hash should be regenerated with the current parameters
+        
+    Example:
+        >>> needs_rehash("$2b$10$...")
+        True
+    """
+    if hashed.startswith(_BCRYPT_PREFIXES):
+        return True
+    try:
+        return _HASHER.check_needs_rehash(hashed)
+    except InvalidHashError:
+        return True
+
+
+def log_password_hash_benchmark() -> float:
+    """
+    Time a single password hash with the configured cost and log it.
+    
+    Lets a deployment check the hash latency (~250 ms target) at startup.
+    
+    Returns:
+        Elapsed time in milliseconds
+    """
+    started = time.perf_counter()
+    hash_password("startup-benchmark")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        f"argon2id hash (t={settings.argon2_time_cost}, m={settings.argon2_memory_cost}, "
+        f"p={settings.argon2_parallelism}) took {elapsed_ms:.0f} ms"
+    )
+    return elapsed_ms
+
+
+def verify_legacy_bcrypt(password: Union[str, bytes], hashed: Union[str, bytes]) -> bool:
+    """
+    Verify a password against a legacy bcrypt hash.
+    
+    Args:
+        password: Plain text password to verify (str or UTF-8 bytes)
+        hashed: Bcrypt hash ($2a$/$2b$/$2y$) to check against
+        
+    Returns:
+        True if password matches, False otherwise
+    """
+    if isinstance(password, str):
+        password = password.encode()
+    if isinstance(hashed, str):
+        hashed = hashed.encode()
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except Exception as e:
+        logger.error(f"Password verification error: {e}")
+        return False
+
+
+def verify_password(password: Union[str, bytes], hashed: Union[str, bytes]) -> bool:
+    """
+    Verify a password against its Argon2 (or legacy bcrypt) hash.
+    
+    Args:
+        password: Plain text password to verify (str or UTF-8 bytes)
+        hashed: Argon2 or bcrypt hash to check against (str or bytes)
         
     Returns:
         True if password matches, False otherwise
@@ -67,39 +205,50 @@ def verify_password(password: str, hashed: str) -> bool:
         >>> verify_password("wrongpassword", hashed)
         False
     """
+    if not hashed:
+        # Users without a stored hash (None or empty) can never log in with a password
+        return False
+    prefixes = _BCRYPT_PREFIXES if isinstance(hashed, str) else _BCRYPT_PREFIXES_BYTES
+    if hashed.startswith(prefixes):
+        return verify_legacy_bcrypt(password, hashed)
     try:
-        return bcrypt.checkpw(password.encode(), hashed.encode())
-    except Exception as e:
+        return _HASHER.verify(hashed, password)
+    except VerifyMismatchError:
+        return False
+    except (VerificationError, InvalidHashError) as e:
         logger.error(f"Password verification error: {e}")
         return False
 
 
-# ============================================================================
-# JWT TOKEN MANAGEMENT
-# ============================================================================
+# Dedicated limiter so a burst of logins can't take every worker thread.
+# argon2-cffi and bcrypt release the GIL, so threads already run hashes on
+# separate cores; one slot per core avoids oversubscribing CPU and Argon2 memory.
+_HASH_LIMITER = CapacityLimiter(settings.password_hash_workers or os.cpu_count() or 1)
+
 
-class TokenPayload:
-    """Represents the payload inside a JWT token."""
+async def ahash_password(password: Union[str, bytes]) -> str:
+    """
+    Async hash_password: runs the hash in a worker thread.
     
-    def __init__(self, ngo_id: str, email: str, org_name: str, role: str = "ngo"):
-        self.ngo_id = ngo_id
-        self.email = email
-        self.org_name = org_name
-        self.role = role
-        self.iat = datetime.now(timezone.utc)
-        self.exp = self.iat + timedelta(hours=settings.jwt_exp_hours)
+    Use from async route handlers so the event loop keeps serving other
+    requests while Argon2 runs.
+    """
+    return await anyio.to_thread.run_sync(hash_password, password, limiter=_HASH_LIMITER)
+
+
+async def averify_password(password: Union[str, bytes], hashed: Union[str, bytes]) -> bool:
+    """
+    Async verify_password: runs the check in a worker thread.
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary for JWT encoding."""
-        return {
-            "sub": self.ngo_id,  # Subject (user ID)
-            "email": self.email,
-            "org_name": self.org_name,
-            "role": self.role,
-            "iat": self.iat,
-            "exp": self.exp,
-        }
+    Use from async route handlers so the event loop keeps serving other
+    requests while Argon2/bcrypt runs.
+    """
+    return await anyio.to_thread.run_sync(verify_password, password, hashed, limiter=_HASH_LIMITER)
+
 
+# ============================================================================
+# JWT TOKEN MANAGEMENT
+# ============================================================================
 
 def create_access_token(ngo_id: str, email: str, org_name: str, role: str = "ngo") -> str:
     """
@@ -122,13 +271,17 @@ def create_access_token(ngo_id: str, email: str, org_name: str, role: str = "ngo
         ... )
         >>> # eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...
     """
-    payload = TokenPayload(ngo_id=ngo_id, email=email, org_name=org_name, role=role)
-    encoded = jwt.encode(
-        payload.to_dict(),
-        settings.jwt_secret_key,
-        algorithm=settings.jwt_algorithm,
-    )
-    return encoded
+    # Integer epoch seconds: PyJWT doesn't need to convert datetimes
+    now = int(time.time())
+    payload = {
+        "sub": ngo_id,  # Subject (user ID)
+        "email": email,
+        "org_name": org_name,
+        "role": role,
+        # No "iat": nothing reads it, and every Authorization header gets shorter
+        "exp": now + _JWT_EXP_SECS,
+    }
+    return jwt.encode(payload, _JWT_SIGNING_KEY, algorithm=_JWT_ALG)
 
 
 def verify_access_token(token: str) -> Dict[str, Any]:
@@ -149,31 +302,139 @@ def verify_access_token(token: str) -> Dict[str, Any]:
         >>> print(payload["ngo_id"])
         550e8400-e29b-41d4-a716-446655440000
     """
+    now = time.time()
+    cached = _TOKEN_CACHE.get(token)
+    if cached is not None:
+        expires_at, result = cached
+        if expires_at > now:
+            if isinstance(result, tuple):
+                raise HTTPException(*result)
+            # Re-insert so eviction drops the least recently used token
+            _TOKEN_CACHE[token] = _TOKEN_CACHE.pop(token)
+            return result
+        del _TOKEN_CACHE[token]
+
     try:
-        payload = jwt.decode(
-            token,
-            settings.jwt_secret_key,
-            algorithms=[settings.jwt_algorithm],
-        )
-        return payload
+        payload = _decode_token(token)
     except jwt.ExpiredSignatureError:
-        raise HTTPException(
-            status_code=401,
-            detail="Token has expired",
-        )
+        _cache_token_result(token, now + _JWT_ERROR_CACHE_TTL, _EXPIRED)
+        raise HTTPException(*_EXPIRED) from None
     except jwt.InvalidTokenError as e:
         logger.error(f"Invalid token: {e}")
-        raise HTTPException(
-            status_code=401,
-            detail="Invalid authentication token",
-        )
+        _cache_token_result(token, now + _JWT_ERROR_CACHE_TTL, _INVALID)
+        raise HTTPException(*_INVALID) from None
+
+    # Never serve a cached payload past the token's own expiry
+    expires_at = min(now + _JWT_CACHE_TTL, float(payload.get("exp", now)))
+    _cache_token_result(token, expires_at, payload)
+    return payload
+
+
+def _b64url_decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+# Header segment PyJWT emits for our tokens; matching it skips a decode + parse
+_HS256_HEADER_B64 = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+
+
+def _fast_decode_hs256(token: str) -> Dict[str, Any]:
+    """
+    Verify and decode an HS256 token without going through PyJWT.
+    
+    Specialized for the tokens this module issues: one HMAC-SHA256 over the
+    signing input, a single JSON parse of the payload, and inline checks of
+    the registered time claims. Raises the same PyJWT exception types as
+    jwt.decode so callers handle both paths identically.
+    """
+    try:
+        signing_input, _, signature_b64 = token.encode("ascii").rpartition(b".")
+        header_b64, _, payload_b64 = signing_input.partition(b".")
+        if not header_b64 or not payload_b64 or b"." in payload_b64:
+            raise jwt.DecodeError("Not enough segments")
+        if header_b64 != _HS256_HEADER_B64:
+            header = orjson.loads(_b64url_decode(header_b64))
+            if not isinstance(header, dict) or header.get("alg") != "HS256":
+                raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+        signature = _b64url_decode(signature_b64)
+    except jwt.InvalidTokenError:
+        raise
+    except (ValueError, TypeError) as e:
+        raise jwt.DecodeError(f"Invalid token encoding: {e}") from e
+
+    expected = hmac.new(_JWT_KEY_BYTES, signing_input, hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, signature):
+        raise jwt.InvalidSignatureError("Signature verification failed")
+
+    try:
+        payload = orjson.loads(_b64url_decode(payload_b64))
+    except ValueError as e:
+        raise jwt.DecodeError(f"Invalid payload string: {e}") from e
+    if not isinstance(payload, dict):
+        raise jwt.DecodeError("Invalid payload string: must be a json object")
+
+    # jwt.decode's claim checks, in its order, for default options with no
+    # audience or issuer configured (tests/test_auth.py compares the two)
+    now = time.time()
+    try:
+        if "iat" in payload and int(payload["iat"]) > now:
+            raise jwt.ImmatureSignatureError("The token is not yet valid (iat)")
+        if "nbf" in payload and int(payload["nbf"]) > now:
+            raise jwt.ImmatureSignatureError("The token is not yet valid (nbf)")
+        if "exp" in payload and int(payload["exp"]) <= now:
+            raise jwt.ExpiredSignatureError("Signature has expired")
+    except (TypeError, ValueError):
+        raise jwt.DecodeError("Time claims (exp, iat, nbf) must be integers") from None
+    if payload.get("aud"):
+        raise jwt.InvalidAudienceError("Invalid audience")
+    if "sub" in payload and not isinstance(payload["sub"], str):
+        raise jwt.exceptions.InvalidSubjectError("Subject must be a string")
+    if "jti" in payload and not isinstance(payload["jti"], str):
+        raise jwt.exceptions.InvalidJTIError("JWT ID must be a string")
+
+    return payload
+
+
+class _OrjsonPyJWT(jwt.PyJWT):
+    """PyJWT with payload parsing done by orjson instead of stdlib json."""
+
+    def _decode_payload(self, decoded: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            payload = orjson.loads(decoded["payload"])
+        except orjson.JSONDecodeError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}") from e
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        return payload
+
+
+_PYJWT = _OrjsonPyJWT()
+
+
+def _pyjwt_decode(token: str) -> Dict[str, Any]:
+    return _PYJWT.decode(token, _JWT_VERIFY_KEY, algorithms=_JWT_ALGS)
+
+
+# HS256 deployments take the specialized path; anything else stays on PyJWT
+_decode_token = _fast_decode_hs256 if _JWT_ALG == "HS256" else _pyjwt_decode
+
+
+def _cache_token_result(
+    token: str,
+    expires_at: float,
+    result: Union[Dict[str, Any], Tuple[int, str]],
+) -> None:
+    """Store a verification result, evicting the least recently used entry when full."""
+    if len(_TOKEN_CACHE) >= _JWT_CACHE_MAX:
+        _TOKEN_CACHE.pop(next(iter(_TOKEN_CACHE)), None)
+    _TOKEN_CACHE[token] = (expires_at, result)
 
 
 # ============================================================================
 # DEPENDENCY INJECTION
 # ============================================================================
 
-async def get_current_user(credentials = Depends(security)) -> Dict[str, Any]:
+async def get_current_user(request: Request, credentials = Depends(security)) -> Dict[str, Any]:
     """
     FastAPI dependency to extract and verify current user from Bearer token.
     
@@ -185,6 +446,7 @@ async def get_current_user(credentials = Depends(security)) -> Dict[str, Any]:
             return {"message": f"Hello {user['email']}"}
     
     Args:
+        request: Incoming request; the verified payload is also stored on request.state.user
         credentials: HTTP Bearer credentials from HTTPBearer security
         
     Returns:
@@ -194,36 +456,53 @@ async def get_current_user(credentials = Depends(security)) -> Dict[str, Any]:
         HTTPException 401: If token is missing or invalid
         HTTPException 403: If user doesn't have required role
     """
-    token = credentials.credentials
-    return verify_access_token(token)
+    payload = verify_access_token(credentials.credentials)
+    request.state.user = payload
+    return payload
 
 
-async def get_current_ngo(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+def require_role(
+    *roles: str, forbidden: str = "You do not have permission to access this resource"
+) -> Callable[..., Awaitable[Dict[str, Any]]]:
     """
-    FastAPI dependency to extract current NGO user and verify role.
+    Build a FastAPI dependency that requires one of the given roles.
+    
+    The allowed roles are captured once as a frozenset, so each request does
+    a single membership test.
     
-    Use this for NGO-only routes:
-        
     Example:
-        @router.get("/ngo/dashboard")
-        def ngo_dashboard(ngo: Dict[str, Any] = Depends(get_current_ngo)):
-            return {"org_name": ngo["org_name"]}
+        get_current_admin = require_role("admin")
+        
+        @router.get("/admin")
+        def admin_route(user: Dict[str, Any] = Depends(get_current_admin)):
+            ...
     
     Args:
-        user: Current user from get_current_user
+        roles: Roles allowed to access the route
+        forbidden: Detail of the 403 raised for other roles
         
     Returns:
-        User payload (verified to be NGO role)
-        
-    Raises:
-        HTTPException 403: If user is not an NGO
+        Dependency returning the verified user payload
     """
-    if user.get("role") != "ngo":
-        raise HTTPException(
-            status_code=403,
-            detail="Only NGO accounts can access this resource",
-        )
-    return user
+    allowed = frozenset(roles)
+    async def dependency(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+        if user.get("role") not in allowed:
+            raise HTTPException(status_code=403, detail=forbidden)
+        return user
+
+    return dependency
+
+
+# FastAPI dependency to extract current NGO user and verify role.
+#
+# Use this for NGO-only routes:
+#
+#     @router.get("/ngo/dashboard")
+#     def ngo_dashboard(ngo: Dict[str, Any] = Depends(get_current_ngo)):
+#         return {"org_name": ngo["org_name"]}
+#
+# Raises HTTPException 403 if the user is not an NGO.
+get_current_ngo = require_role("ngo", forbidden="Only NGO accounts can access this resource")
 
 
 # ============================================================================
@@ -234,14 +513,12 @@ class AuthMiddleware:
     """Middleware to track authenticated requests (optional)."""
     
     async def __call__(self, request: Request, call_next):
-        """Log authentication info for monitoring."""
+        """Record the verified payload for monitoring; routes still verify via get_current_user."""
         auth_header = request.headers.get("authorization", "")
         if auth_header.startswith("Bearer "):
             try:
                 token = auth_header[7:]  # Remove "Bearer " prefix
-                payload = verify_access_token(token)
-                request.state.user = payload
-                logger.info(f"Authenticated request from NGO: {payload.get('email')}")
+                request.state.user = verify_access_token(token)
             except HTTPException:
                 # Invalid token, but don't block - let the route handle it
                 pass
@@ -254,16 +531,21 @@ class AuthMiddleware:
 # TOKEN RESPONSE MODELS (use in schemas.py)
 # ============================================================================
 
-from pydantic import BaseModel
+from dataclasses import dataclass
+
+# Plain slotted dataclasses: these are only ever built and serialized, so
+# Pydantic validation on construction is wasted work.
 
-class Token(BaseModel):
+@dataclass(slots=True)
+class Token:
     """JWT access token response."""
     access_token: str
     token_type: str = "bearer"
-    expires_in: int = settings.jwt_exp_hours * 3600  # seconds
+    expires_in: int = _JWT_EXP_SECS  # seconds
 
 
-class TokenData(BaseModel):
+@dataclass(slots=True)
+class TokenData:
     """Decoded token payload."""
     ngo_id: str
     email: str
@@ -1,4 +1,4 @@
-from functools import lru_cache
+from functools import cached_property, lru_cache
 from pathlib import Path
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -15,6 +15,10 @@ class Settings(BaseSettings):
     api_prefix: str = "/api"
     cors_origins: str = "http://localhost:5173,http://127.0.0.1:5173,http://localhost:8080,http://127.0.0.1:8080"
 
+    server_host: str = "127.0.0.1"
+    server_port: int = 8000
+    server_workers: int = 1
+
     supabase_url: str | None = None
     supabase_anon_key: str | None = None
     supabase_service_role_key: str | None = None
@@ -29,6 +33,9 @@ class Settings(BaseSettings):
     ollama_model_story: str = "hf.co/mistralai/Mistral-7B-Instruct-v0.3"
     ollama_request_timeout_seconds: int = 120
     ollama_fallback_to_default: bool = True
+    ollama_breaker_failure_threshold: int = 3
+    ollama_breaker_cooldown_seconds: int = 30
+    story_generation_in_background: bool = False
 
     safety_critic_enabled: bool = True
     safety_critic_strict: bool = False
@@ -47,15 +54,31 @@ class Settings(BaseSettings):
     sd15_guidance_scale: float = 6.0
     sd15_width: int = 384
     sd15_height: int = 384
+    sd15_device: str = "auto"  # auto | cuda | mps | cpu
+    sd15_batch_size: int = 4
+    sd15_compile_unet: bool = False
 
     jwt_secret_key: str = "your-secret-key-change-in-production"  # ⚠️ Must be set via .env in production
-    jwt_algorithm: str = "HS256"
+    jwt_algorithm: str = "HS256"  # or EdDSA with the PEM keys below (needs PyJWT[crypto])
+    jwt_private_key: str | None = None
+    jwt_public_key: str | None = None
     jwt_exp_hours: int = 24
+    jwt_cache_ttl_seconds: int = 3600  # verified payloads are never cached past their exp
+    jwt_cache_max_entries: int = 10_000
+
+    argon2_time_cost: int = 2
+    argon2_memory_cost: int = 65536  # KiB
+    argon2_parallelism: int = 1
+    password_hash_workers: int = 0  # concurrent hash/verify calls; 0 = CPU count
 
     @property
     def supabase_key(self) -> str | None:
         return self.supabase_service_role_key or self.supabase_anon_key
 
+    @cached_property
+    def ollama_generate_endpoint(self) -> str:
+        return f"{self.ollama_base_url.rstrip('/')}/api/generate"
+
     @property
     def cors_origin_list(self) -> list[str]:
         return [origin.strip() for origin in self.cors_origins.split(",") if origin.strip()]
@@ -1,28 +1,40 @@
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Any
+import asyncio
+import base64
+import binascii
 import hashlib
+import hmac
 import logging
+import uuid
+import orjson
 from pathlib import Path
 
-from fastapi import APIRouter, FastAPI, HTTPException, Query, Depends, Request
+from fastapi import APIRouter, BackgroundTasks, FastAPI, HTTPException, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from starlette.middleware.base import BaseHTTPMiddleware
 from postgrest.exceptions import APIError
 
 from app.config import BASE_DIR, get_settings
 from app.auth import (
-    hash_password,
-    verify_password,
+    ahash_password,
+    averify_password,
+    log_password_hash_benchmark,
+    needs_rehash,
     create_access_token,
     get_current_user,
     get_current_ngo,
 )
 from app.image_generation import ImageGenerationError, generate_story_images
-from app.safety_critic import SafetyCriticError, apply_safety_critic
+from app.ollama_client import close_ollama_client
+from app.safety_critic import SafetyCriticError, apply_safety_critic, run_optional_llm_review
 from app.schemas import (
+    Choice,
     DashboardStats,
     ErrorResponse,
     NgoLoginRequest,
@@ -37,7 +49,7 @@ from app.schemas import (
     StudentProfileCreate,
     StudentProfileResponse,
 )
-from app.supabase_client import get_supabase_client
+from app.supabase_client import close_async_supabase_client, get_async_supabase_client
 from app.story_generation import (
     StoryGenerationError,
     build_default_branching_slides,
@@ -45,19 +57,43 @@ from app.story_generation import (
 )
 
 settings = get_settings()
-app = FastAPI(title="SafePath Stories API", version="0.1.0")
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Log password hash latency so deployments can check the ARGON2_* cost
+    log_password_hash_benchmark()
+    if settings.supabase_url and settings.supabase_key:
+        await get_async_supabase_client()
+    yield
+    await close_async_supabase_client()
+    await close_ollama_client()
+
+
+app = FastAPI(
+    title="SafePath Stories API",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # orjson serializes every route response
+)
+
 generated_images_path = BASE_DIR / settings.generated_images_dir
 Path(generated_images_path).mkdir(parents=True, exist_ok=True)
 app.mount(f"/{settings.generated_images_url_path.strip('/')}", StaticFiles(directory=str(generated_images_path)), name="generated-images")
 
+# Story lists and slides repeat the same keys on every row, so JSON compresses well.
+# Added first so it sits innermost: the BaseHTTPMiddleware layers added later re-stream
+# bodies, which would otherwise defeat the minimum_size check.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origin_list,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 router = APIRouter(prefix=settings.api_prefix)
@@ -227,8 +263,20 @@ def raise_supabase_http_error(error: APIError) -> None:
     raise HTTPException(status_code=502, detail=f"Database error: {message}")
 
 
-def to_story(row: dict[str, Any]) -> Story:
-    """Convert database row to Story model with consistent datetime serialization."""
+# Columns read by to_story / to_slide; selecting only these keeps description,
+# moral_lesson etc. off the wire for list and detail reads
+STORY_COLS = "id, title, topic, age_group, language, cover_image_url, status, students_reached, completion_rate, created_at"
+SLIDE_COLS = "position, image_url, text, choices"
+
+
+def to_story_dict(row: dict[str, Any], fallback_created_at: str | None = None) -> dict[str, Any]:
+    """
+    Convert database row to the Story response shape (camelCase keys) as a plain dict.
+
+    List endpoints serialize these directly with ORJSON, skipping Pydantic.
+    Batch callers pass fallback_created_at (computed once) so rows without
+    created_at don't each allocate a fresh timestamp.
+    """
     created_at = row.get("created_at")
     
     # ✅ FIXED: Convert datetime to ISO string for JSON serialization (consistent with StudentProfileResponse)
@@ -239,29 +287,42 @@ def to_story(row: dict[str, Any]) -> Story:
         created_at_str = created_at
     else:
         # Fallback to current timestamp
-        created_at_str = datetime.utcnow().isoformat()
+        created_at_str = fallback_created_at or datetime.utcnow().isoformat()
 
-    return Story(
-        id=str(row["id"]),
-        title=row["title"],
-        topic=row["topic"],
-        ageGroup=row["age_group"],
-        language=row["language"],
-        coverImage=row.get("cover_image_url"),
-        status=row.get("status", "draft"),
-        studentsReached=row.get("students_reached", 0) or 0,
-        completionRate=row.get("completion_rate", 0) or 0,
-        createdAt=created_at_str,
-    )
+    return {
+        "id": str(row["id"]),
+        "title": row["title"],
+        "topic": row["topic"],
+        "ageGroup": row["age_group"],
+        "language": row["language"],
+        "coverImage": row.get("cover_image_url"),
+        "status": row.get("status", "draft"),
+        "studentsReached": row.get("students_reached", 0) or 0,
+        "completionRate": row.get("completion_rate", 0) or 0,
+        "createdAt": created_at_str,
+    }
+
+
+def to_story(row: dict[str, Any], fallback_created_at: str | None = None) -> Story:
+    # Rows come from our own table, so skip Pydantic validation
+    return Story.model_construct(**to_story_dict(row, fallback_created_at))
+
+
+def to_slide_dict(row: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": int(row["position"]),
+        "image": row.get("image_url"),
+        "text": row["text"],
+        "choices": row.get("choices"),
+    }
 
 
 def to_slide(row: dict[str, Any]) -> StorySlide:
-    return StorySlide(
-        id=int(row["position"]),
-        image=row.get("image_url"),
-        text=row["text"],
-        choices=row.get("choices"),
-    )
+    slide = to_slide_dict(row)
+    choices = slide["choices"]
+    if choices:
+        slide["choices"] = [Choice.model_construct(**choice) for choice in choices]
+    return StorySlide.model_construct(**slide)
 
 
 # ============================================================================
@@ -431,14 +492,25 @@ def example_errors(error_type: str | None = Query(None, description="Type of err
     return {"status": "ok", "message": "No error demonstrated"}
 
 
+async def rehash_and_store_password(ngo_id: Any, password: bytes) -> None:
+    """Re-hash a verified password with current Argon2 parameters (run as a background task)."""
+    try:
+        new_hash = await ahash_password(password)
+        client = await get_async_supabase_client()
+        await client.table("ngo_accounts").update({"password_hash": new_hash}).eq("id", ngo_id).execute()
+    except APIError as error:
+        # Keep the old hash; it is still valid
+        logger.warning("Password rehash for NGO %s not stored: %s", ngo_id, error)
+
+
 @router.post("/auth/ngo/login", response_model=NgoLoginResponse)
-def ngo_login(payload: NgoLoginRequest) -> NgoLoginResponse:
+async def ngo_login(payload: NgoLoginRequest, background_tasks: BackgroundTasks) -> NgoLoginResponse:
     """
     Login NGO with email and password.
     
     ✅ REFACTORED: 
     - Returns database-generated UUID as ngoId (not email-derived)
-    - Uses bcrypt for secure password verification
+    - Uses Argon2id for secure password verification (legacy hashes upgraded in the background)
     - Returns JWT token for authenticated requests
     
     Returns:
@@ -451,9 +523,9 @@ def ngo_login(payload: NgoLoginRequest) -> NgoLoginResponse:
     if not payload.email or not payload.password:
         raise HTTPException(status_code=400, detail="Email and password are required")
 
-    client = get_supabase_client()
+    client = await get_async_supabase_client()
     try:
-        result = (
+        result = await (
             client.table("ngo_accounts")
             .select("id, password_hash, org_name")
             .eq("email", payload.email)
@@ -468,25 +540,23 @@ def ngo_login(payload: NgoLoginRequest) -> NgoLoginResponse:
 
     row = result.data[0]
     stored_hash = row.get("password_hash", "")
+    # Encode once; verification, rehash and the legacy check all take bytes
+    password_bytes = payload.password.encode()
 
-    # First try bcrypt verification
-    if verify_password(payload.password, stored_hash):
+    # First try Argon2 (or legacy bcrypt) verification
+    if await averify_password(password_bytes, stored_hash):
         verified = True
+        # Upgrade legacy bcrypt hashes and Argon2 hashes with outdated parameters
+        # after the response is sent, so the user doesn't wait on a second hash
+        if needs_rehash(stored_hash):
+            background_tasks.add_task(rehash_and_store_password, row["id"], password_bytes)
     else:
         # Backwards-compatibility: some users may have passwords hashed with SHA256.
-        # If SHA256 matches, re-hash with bcrypt and update the DB.
-        legacy_sha = hashlib.sha256(payload.password.encode()).hexdigest()
-        if legacy_sha == stored_hash:
-            # Re-hash with bcrypt and update stored password
-            try:
-                new_hash = hash_password(payload.password)
-                client.table("ngo_accounts").update({"password_hash": new_hash}).eq("id", row["id"]).execute()
-                verified = True
-            except APIError:
-                # If update fails, still allow login for compatibility
-                verified = True
-        else:
-            verified = False
+        # If SHA256 matches (constant-time compare), re-hash with Argon2 in the background.
+        legacy_sha = hashlib.sha256(password_bytes).hexdigest()
+        verified = hmac.compare_digest(legacy_sha, stored_hash)
+        if verified:
+            background_tasks.add_task(rehash_and_store_password, row["id"], password_bytes)
 
     if not verified:
         raise HTTPException(status_code=401, detail="Invalid email or password")
@@ -513,13 +583,13 @@ def ngo_login(payload: NgoLoginRequest) -> NgoLoginResponse:
 
 
 @router.post("/auth/ngo/signup", response_model=NgoSignupResponse)
-def ngo_signup(payload: NgoSignupRequest) -> NgoSignupResponse:
+async def ngo_signup(payload: NgoSignupRequest) -> NgoSignupResponse:
     """
     Sign up new NGO.
     
     ✅ REFACTORED:
     - Database generates UUID automatically (PostgreSQL gen_random_uuid())
-    - Uses bcrypt for secure password hashing
+    - Uses Argon2id for secure password hashing
     - Returns JWT token for authenticated requests
     - No email-derived ID logic
     
@@ -534,11 +604,11 @@ def ngo_signup(payload: NgoSignupRequest) -> NgoSignupResponse:
     if not payload.email or not payload.password or not payload.orgName:
         raise HTTPException(status_code=400, detail="Email, password, and organization name are required")
 
-    client = get_supabase_client()
+    client = await get_async_supabase_client()
 
     # Check if email already exists
     try:
-        existing = (
+        existing = await (
             client.table("ngo_accounts")
             .select("id")
             .eq("email", payload.email)
@@ -550,17 +620,17 @@ def ngo_signup(payload: NgoSignupRequest) -> NgoSignupResponse:
     if existing.data:
         raise HTTPException(status_code=409, detail="Email already registered")
 
-    # ✅ Create new NGO account with bcrypt-hashed password
-    hashed_pw = hash_password(payload.password)
+    # ✅ Create new NGO account with Argon2-hashed password
+    hashed_pw = await ahash_password(payload.password.encode())
     try:
-        result = (
+        result = await (
             client.table("ngo_accounts")
             .insert(
                 {
                     # ✅ DO NOT include id - database generates it via gen_random_uuid()
                     "org_name": payload.orgName,
                     "email": payload.email,
-                    "password_hash": hashed_pw,  # ✅ Bcrypt hashed
+                    "password_hash": hashed_pw,  # ✅ Argon2 hashed
                 }
             )
             .execute()
@@ -596,10 +666,10 @@ def ngo_signup(payload: NgoSignupRequest) -> NgoSignupResponse:
 
 
 @router.post("/students", response_model=StudentProfileResponse)
-def create_student_profile(payload: StudentProfileCreate) -> StudentProfileResponse:
-    client = get_supabase_client()
+async def create_student_profile(payload: StudentProfileCreate) -> StudentProfileResponse:
+    client = await get_async_supabase_client()
     try:
-        result = (
+        result = await (
             client.table(settings.supabase_students_table)
             .insert(
                 {
@@ -634,14 +704,44 @@ def create_student_profile(payload: StudentProfileCreate) -> StudentProfileRespo
     )
 
 
+def encode_story_cursor(row: dict[str, Any]) -> str:
+    """Opaque keyset cursor for the (created_at, id) ordering of list_stories."""
+    return base64.urlsafe_b64encode(f"{row['created_at']}|{row['id']}".encode()).decode()
+
+
+def decode_story_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        created_at, story_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        datetime.fromisoformat(created_at)
+        uuid.UUID(story_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, story_id
+
+
 @router.get("/stories", response_model=list[Story])
-def list_stories(
+async def list_stories(
     status: str | None = Query(default=None),
     topic: str | None = Query(default=None),
     age_group: str | None = Query(default=None),
-) -> list[Story]:
-    client = get_supabase_client()
-    query = client.table(settings.supabase_stories_table).select("*").order("created_at", desc=True)
+    limit: int = Query(default=50, ge=1, le=200, description="Number of stories per page"),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor value from the previous page"),
+) -> ORJSONResponse:
+    """
+    List stories newest first, one page at a time.
+
+    Keyset pagination on (created_at, id): when more rows may follow, the
+    response carries an X-Next-Cursor header to pass back as ?cursor=.
+    The body stays a plain list of stories.
+    """
+    client = await get_async_supabase_client()
+    query = (
+        client.table(settings.supabase_stories_table)
+        .select(STORY_COLS)
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit)
+    )
 
     if status:
         query = query.eq("status", status)
@@ -649,18 +749,35 @@ def list_stories(
         query = query.eq("topic", topic)
     if age_group:
         query = query.eq("age_group", age_group)
+    if cursor:
+        created_at, story_id = decode_story_cursor(cursor)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{story_id})')
 
-    result = query.execute()
-    return [to_story(row) for row in (result.data or [])]
+    result = await query.execute()
+    rows = result.data or []
+    now_iso = datetime.utcnow().isoformat()
+    # Returning a Response skips FastAPI's second validation pass over response_model
+    response = ORJSONResponse([to_story_dict(row, now_iso) for row in rows])
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_story_cursor(rows[-1])
+    return response
+
+
+# Search terms go inside double quotes in the or= filter, so commas, parentheses
+# and dots are literal. Escape LIKE specials (\ % _) with a backslash, then
+# backslash-escape \ and " again for the quoted PostgREST value. PostgREST turns
+# every * in a like pattern into %, even escaped ones, so * is dropped instead.
+_SEARCH_ESCAPES = str.maketrans({"\\": "\\\\\\\\", "%": "\\\\%", "_": "\\\\_", '"': '\\"', "*": None})
+_SEARCH_OR_TEMPLATE = 'title.ilike."%{p}%",description.ilike."%{p}%"'.format
 
 
 @router.get("/stories/search", response_model=StorySearchResponse)
-def search_stories(
+async def search_stories(
     q: str = Query(..., min_length=1, description="Search term (searches title and description)"),
     limit: int = Query(default=10, ge=1, le=100, description="Number of results per page"),
     offset: int = Query(default=0, ge=0, description="Number of results to skip"),
     user: dict = Depends(get_current_ngo),  # ✅ Require JWT + NGO role
-) -> StorySearchResponse:
+) -> ORJSONResponse:
     """
     Search stories by title and description (case-insensitive).
     ✅ Filtered by authenticated NGO
@@ -671,76 +788,87 @@ def search_stories(
     GET /stories/search?q=water+safety&limit=10&offset=0
     Authorization: Bearer <jwt_token>
     """
-    client = get_supabase_client()
+    client = await get_async_supabase_client()
     ngo_id = user.get("sub")
     
     # ✅ Search in title OR description (case-insensitive), filtered by NGO
-    # Using ilike for case-insensitive partial matching
-    search_pattern = f"%{q}%"
+    # Using ilike for case-insensitive partial matching; q is escaped so it can't
+    # inject PostgREST filter syntax or LIKE wildcards
+    search_filter = _SEARCH_OR_TEMPLATE(p=q.translate(_SEARCH_ESCAPES))
     
-    # First query: get total count matching the search criteria
+    # Single ranged query: count="exact" returns the total in Content-Range alongside the page
     try:
-        count_result = (
+        search_result = await (
             client.table(settings.supabase_stories_table)
-            .select("id", count="exact")  # count=exact gets total count without pagination
+            .select(STORY_COLS, count="exact")
             .eq("ngo_id", ngo_id)
-            .or_(f"title.ilike.{search_pattern},description.ilike.{search_pattern}")
-            .execute()
-        )
-        total = count_result.count if hasattr(count_result, 'count') else len(count_result.data or [])
-    except Exception as e:
-        logger.error(f"Error counting search results: {e}")
-        total = 0
-    
-    # Second query: get paginated results ordered by creation date (newest first)
-    try:
-        search_result = (
-            client.table(settings.supabase_stories_table)
-            .select("*")
-            .eq("ngo_id", ngo_id)
-            .or_(f"title.ilike.{search_pattern},description.ilike.{search_pattern}")
+            .or_(search_filter)
             .order("created_at", desc=True)
-            .limit(limit)
-            .offset(offset)
+            .range(offset, offset + limit - 1)
             .execute()
         )
-        stories = [to_story(row) for row in (search_result.data or [])]
+        rows = search_result.data or []
+        total = search_result.count if search_result.count is not None else len(rows)
+        now_iso = datetime.utcnow().isoformat()
+        stories = [to_story_dict(row, now_iso) for row in rows]
     except Exception as e:
         logger.error(f"Error searching stories: {e}")
         stories = []
+        total = 0
     
-    return StorySearchResponse(
-        stories=stories,
-        total=total,
-        limit=limit,
-        offset=offset,
-    )
+    return ORJSONResponse({
+        "stories": stories,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    })
+
+
+def conditional_json_response(request: Request, content: Any) -> Response:
+    """
+    Serialize content with a weak content-hash ETag that clients must revalidate.
+
+    Returns 304 with no body when If-None-Match already holds the same ETag,
+    so repeat fetches during a lesson skip the payload transfer. no-cache (not
+    max-age) keeps polls of a "generating" story from being served stale.
+    """
+    body = orjson.dumps(content)
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in {tag.strip() for tag in if_none_match.split(",")}):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @router.get("/stories/{story_id}", response_model=Story)
-def get_story(story_id: str) -> Story:
-    client = get_supabase_client()
-    result = client.table(settings.supabase_stories_table).select("*").eq("id", story_id).limit(1).execute()
+async def get_story(story_id: str, request: Request) -> Response:
+    client = await get_async_supabase_client()
+    result = await client.table(settings.supabase_stories_table).select(STORY_COLS).eq("id", story_id).limit(1).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Story not found")
-    return to_story(result.data[0])
+    return conditional_json_response(request, to_story_dict(result.data[0]))
 
 
 @router.get("/stories/{story_id}/slides", response_model=list[StorySlide])
-def get_story_slides(story_id: str) -> list[StorySlide]:
-    client = get_supabase_client()
-    result = (
+async def get_story_slides(story_id: str, request: Request) -> Response:
+    client = await get_async_supabase_client()
+    result = await (
         client.table(settings.supabase_slides_table)
-        .select("*")
+        .select(SLIDE_COLS)
         .eq("story_id", story_id)
         .order("position", desc=False)
         .execute()
     )
-    return [to_slide(row) for row in (result.data or [])]
+    return conditional_json_response(request, [to_slide_dict(row) for row in (result.data or [])])
+
+
+# "published" stays publishable so repeating the request is a no-op, as before
+PUBLISHABLE_STATUSES = ["draft", "published"]
 
 
 @router.patch("/stories/{story_id}/publish", response_model=Story)
-def publish_story(
+async def publish_story(
     story_id: str,
     user: dict = Depends(get_current_ngo),  # ✅ Require JWT + NGO role
 ) -> Story:
@@ -763,6 +891,7 @@ def publish_story(
         HTTPException 401: Missing or invalid JWT token
         HTTPException 403: User is not an NGO, or story doesn't belong to NGO
         HTTPException 404: Story not found
+        HTTPException 409: Story is still generating (or generation failed)
         
     Example:
         PATCH /api/stories/story-123/publish
@@ -770,45 +899,48 @@ def publish_story(
     """
     ngo_id = user.get("sub")  # JWT "sub" (subject) is the ngo_id
     
-    client = get_supabase_client()
-    
-    # ✅ Query story
-    try:
-        result = (
-            client.table(settings.supabase_stories_table)
-            .select("*")
-            .eq("id", story_id)
-            .limit(1)
-            .execute()
-        )
-    except APIError as error:
-        raise_supabase_http_error(error)
-    
-    if not result.data:
-        raise HTTPException(status_code=404, detail="Story not found")
-    
-    story = result.data[0]
-    
-    # ✅ Verify story belongs to authenticated NGO (403 if not)
-    if story.get("ngo_id") != ngo_id:
-        raise HTTPException(
-            status_code=403,
-            detail="You can only publish your own stories",
-        )
+    client = await get_async_supabase_client()
     
-    # ✅ Update story status to published
+    # ✅ Ownership and status are enforced by the WHERE clause, so the common case is
+    # a single UPDATE ... RETURNING with no read-then-write gap. Stories that are
+    # still "generating" (or "failed") have no slides and cannot be published.
     try:
-        update_result = (
+        update_result = await (
             client.table(settings.supabase_stories_table)
             .update({"status": "published"})
             .eq("id", story_id)
+            .eq("ngo_id", ngo_id)
+            .in_("status", PUBLISHABLE_STATUSES)
             .execute()
         )
     except APIError as error:
         raise_supabase_http_error(error)
     
     if not update_result.data:
-        raise HTTPException(status_code=500, detail="Failed to publish story")
+        # Nothing updated: find out whether the story is missing, someone else's or not ready
+        try:
+            result = await (
+                client.table(settings.supabase_stories_table)
+                .select("ngo_id, status")
+                .eq("id", story_id)
+                .limit(1)
+                .execute()
+            )
+        except APIError as error:
+            raise_supabase_http_error(error)
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Story not found")
+        story = result.data[0]
+        # ✅ Story belongs to another NGO (403)
+        if str(story.get("ngo_id")) != ngo_id:
+            raise HTTPException(
+                status_code=403,
+                detail="You can only publish your own stories",
+            )
+        raise HTTPException(
+            status_code=409,
+            detail=f"Story is {story.get('status')} and cannot be published yet",
+        )
     
     updated_story = update_result.data[0]
     
@@ -817,9 +949,115 @@ def publish_story(
     return to_story(updated_story)
 
 
+async def build_story_slides(payload: StoryCreateRequest, story_id: str) -> list[dict[str, Any]]:
+    """Run story generation, the safety critic and image rendering; return slide rows to insert."""
+    slides_source = "ollama"
+    try:
+        generated = await generate_story_with_ollama(payload)
+        slides_to_store = generated.slides
+    except StoryGenerationError as error:
+        if not settings.ollama_fallback_to_default:
+            raise HTTPException(status_code=502, detail=f"Story generation failed: {error}")
+        logger.warning("Ollama generation failed, using default slides: %s", error)
+        slides_source = "default"
+        slides_to_store = build_default_branching_slides(payload)
+
+    try:
+        # Deterministic rules only: microseconds of CPU, fine on the event loop
+        critic_result = apply_safety_critic(payload, slides_to_store)
+        slides_to_store = critic_result.slides
+        needs_review = critic_result.needs_review
+        if critic_result.issues:
+            logger.info("Safety critic adjusted story %s: %s", story_id, "; ".join(critic_result.issues))
+    except SafetyCriticError as error:
+        if settings.safety_critic_strict:
+            raise HTTPException(status_code=422, detail=f"Safety validation failed: {error}")
+        logger.warning("Safety critic failed, falling back to default safe slides: %s", error)
+        slides_to_store = build_default_branching_slides(payload)
+        needs_review = False
+
+    # The advisory LLM review waits on Ollama while SD renders the images; it is
+    # skipped when the deterministic rules had nothing to fix
+    review_task = asyncio.create_task(run_optional_llm_review(payload, slides_to_store)) if needs_review else None
+
+    image_urls: list[str | None]
+    llm_review: dict[str, Any] | None = None
+    try:
+        try:
+            image_urls = await asyncio.to_thread(
+                generate_story_images, payload=payload, story_id=story_id, slides=slides_to_store
+            )
+        except ImageGenerationError as error:
+            logger.warning("Slide image generation skipped: %s", error)
+            image_urls = [None for _ in slides_to_store]
+
+        if review_task is not None:
+            llm_review = await review_task
+    finally:
+        # If image rendering failed some other way, stop the review instead of
+        # leaving it running with its result never retrieved
+        if review_task is not None:
+            review_task.cancel()
+            await asyncio.gather(review_task, return_exceptions=True)
+
+    if llm_review is not None:
+        logger.info("Safety critic LLM review for story %s: %s", story_id, llm_review)
+
+    slides_payload = [
+        {
+            "position": slide["position"],
+            "image_url": image_urls[index],
+            "text": slide["text"],
+            "choices": slide["choices"],
+        }
+        for index, slide in enumerate(slides_to_store)
+    ]
+
+    if slides_source == "default":
+        logger.info("Generated story %s using fallback slide generator", story_id)
+
+    return slides_payload
+
+
+async def complete_story_generation(story_id: str, payload: StoryCreateRequest) -> None:
+    """
+    Background half of create_story when STORY_GENERATION_IN_BACKGROUND is enabled.
+
+    Fills in the slides of a story inserted with status "generating", then
+    flips it to "draft"; clients poll GET /stories/{id} for the status change.
+    """
+    client = await get_async_supabase_client()
+    try:
+        slides_payload = await build_story_slides(payload, story_id)
+        await client.table(settings.supabase_slides_table).insert(
+            [{"story_id": story_id, **slide} for slide in slides_payload]
+        ).execute()
+        # Only leave "generating": never overwrite a status changed in the meantime
+        await (
+            client.table(settings.supabase_stories_table)
+            .update({"status": "draft"})
+            .eq("id", story_id)
+            .eq("status", "generating")
+            .execute()
+        )
+    except Exception:
+        logger.exception("Background generation failed for story %s", story_id)
+        try:
+            await (
+                client.table(settings.supabase_stories_table)
+                .update({"status": "failed"})
+                .eq("id", story_id)
+                .eq("status", "generating")
+                .execute()
+            )
+        except APIError as error:
+            logger.error("Could not mark story %s as failed: %s", story_id, error)
+
+
 @router.post("/stories", response_model=StoryCreateResponse)
-def create_story(
+async def create_story(
     payload: StoryCreateRequest,
+    background_tasks: BackgroundTasks,
     user: dict = Depends(get_current_ngo),  # ✅ Require JWT authentication
 ) -> StoryCreateResponse:
     """
@@ -828,19 +1066,21 @@ def create_story(
     ✅ REFACTORED:
     - Now requires JWT authentication via Bearer token
     - Uses authenticated user's ngo_id instead of trusting client input
-    - Verifies ngo_id is a valid UUID and exists in database
+    - Relies on the stories.ngo_id foreign key to reject unknown NGOs
     
     Args:
         payload: Story creation request
         user: Current authenticated NGO user from JWT token
         
     Returns:
-        StoryCreateResponse with story and slides
+        StoryCreateResponse with story and slides. With STORY_GENERATION_IN_BACKGROUND
+        enabled, the story comes back with status "generating" and no slides;
+        they are filled in after the response is sent.
         
     Raises:
         HTTPException 401: Missing or invalid JWT token
-        HTTPException 403: User is not an NGO
-        HTTPException 400: Invalid NGO ID or invalid request body
+        HTTPException 403: User is not an NGO, or the NGO account no longer exists
+        HTTPException 400: Invalid request body
         HTTPException 500: Failed to create story
         
     Example:
@@ -859,106 +1099,60 @@ def create_story(
     # ✅ Use authenticated user's ngo_id instead of payload
     ngo_id = user.get("sub")  # JWT "sub" (subject) is the ngo_id
     
-    client = get_supabase_client()
-
-    # ✅ Verify the ngo_id exists in database (should always be true since it came from JWT)
+    client = await get_async_supabase_client()
+
+    # Generate the id up front so images can be named before anything is written;
+    # the story and its slides are then committed together by one RPC call.
+    # In background mode the story is committed alone and slides follow later.
+    story_id = str(uuid.uuid4())
+    in_background = settings.story_generation_in_background
+    story_payload = {
+        "id": story_id,
+        "ngo_id": ngo_id,  # ✅ From authenticated user
+        "title": payload.title,
+        "topic": payload.topic,
+        "age_group": payload.ageGroup,
+        "language": payload.language,
+        "region_context": payload.regionContext,
+        "description": payload.description,
+        "moral_lesson": payload.moralLesson,
+        "character_count": payload.characterCount,
+        "status": "generating" if in_background else "draft",
+    }
+    slides_payload = [] if in_background else await build_story_slides(payload, story_id)
+
+    # The JWT signature was already verified by get_current_ngo; the stories.ngo_id
+    # foreign key rejects unknown NGOs at insert time (23503), so no pre-check query
     try:
-        ngo_check = (
-            client.table("ngo_accounts")
-            .select("id")
-            .eq("id", ngo_id)
-            .limit(1)
-            .execute()
-        )
+        created = await client.rpc(
+            "create_story_with_slides", {"story": story_payload, "slides": slides_payload}
+        ).execute()
     except APIError as error:
+        if error.code in ("23503", "22P02"):  # FK violation / ngo_id is not a uuid
+            raise HTTPException(status_code=403, detail="NGO not found")
         raise_supabase_http_error(error)
 
-    if not ngo_check.data:
-        raise HTTPException(status_code=403, detail="NGO not found")
-
-    story_insert = (
-        client.table(settings.supabase_stories_table)
-        .insert(
-            {
-                "ngo_id": ngo_id,  # ✅ From authenticated user
-                "title": payload.title,
-                "topic": payload.topic,
-                "age_group": payload.ageGroup,
-                "language": payload.language,
-                "region_context": payload.regionContext,
-                "description": payload.description,
-                "moral_lesson": payload.moralLesson,
-                "character_count": payload.characterCount,
-                "status": "draft",
-            }
-        )
-        .execute()
-    )
-
-    if not story_insert.data:
+    if not created.data:
         raise HTTPException(status_code=500, detail="Failed to create story")
 
-    story_row = story_insert.data[0]
-    slides_source = "ollama"
-    try:
-        generated = generate_story_with_ollama(payload)
-        slides_to_store = generated.slides
-    except StoryGenerationError as error:
-        if not settings.ollama_fallback_to_default:
-            raise HTTPException(status_code=502, detail=f"Story generation failed: {error}")
-        logger.warning("Ollama generation failed, using default slides: %s", error)
-        slides_source = "default"
-        slides_to_store = build_default_branching_slides(payload)
-
-    try:
-        critic_result = apply_safety_critic(payload, slides_to_store)
-        slides_to_store = critic_result.slides
-        if critic_result.issues:
-            logger.info("Safety critic adjusted story %s: %s", story_row["id"], "; ".join(critic_result.issues))
-        if critic_result.llm_review is not None:
-            logger.info("Safety critic LLM review for story %s: %s", story_row["id"], critic_result.llm_review)
-    except SafetyCriticError as error:
-        if settings.safety_critic_strict:
-            raise HTTPException(status_code=422, detail=f"Safety validation failed: {error}")
-        logger.warning("Safety critic failed, falling back to default safe slides: %s", error)
-        slides_to_store = build_default_branching_slides(payload)
-
-    image_urls: list[str | None]
-    try:
-        image_urls = generate_story_images(payload=payload, story_id=str(story_row["id"]), slides=slides_to_store)
-    except ImageGenerationError as error:
-        logger.warning("Slide image generation skipped: %s", error)
-        image_urls = [None for _ in slides_to_store]
+    story_row = created.data["story"]
+    slides = [to_slide(row) for row in (created.data["slides"] or [])]
 
-    slides_payload = [
-        {
-            "story_id": story_row["id"],
-            "position": slide["position"],
-            "image_url": image_urls[index],
-            "text": slide["text"],
-            "choices": slide["choices"],
-        }
-        for index, slide in enumerate(slides_to_store)
-    ]
-
-    slide_insert = client.table(settings.supabase_slides_table).insert(slides_payload).execute()
-    slides = [to_slide(row) for row in (slide_insert.data or [])]
-
-    if slides_source == "default":
-        logger.info("Created story %s using fallback slide generator", story_row["id"])
+    if in_background:
+        background_tasks.add_task(complete_story_generation, story_id, payload)
 
     return StoryCreateResponse(story=to_story(story_row), slides=slides)
 
 
 @router.get("/dashboard/stats", response_model=DashboardStats)
-def get_dashboard_stats(user: dict = Depends(get_current_ngo)) -> DashboardStats:
+async def get_dashboard_stats(user: dict = Depends(get_current_ngo)) -> ORJSONResponse:
     """
     Get dashboard stats for authenticated NGO.
     
     ✅ REFACTORED:
     - Requires JWT authentication via Bearer token
     - Extracts ngo_id from token (prevents viewing other NGOs' stats)
-    - Optimized single query with all needed fields
+    - Aggregates server-side via the dashboard_stats RPC
     - Accurate counts and aggregations
     - Proper security: users can only see their own stats
     
@@ -982,36 +1176,30 @@ def get_dashboard_stats(user: dict = Depends(get_current_ngo)) -> DashboardStats
     """
     ngo_id = user.get("sub")  # JWT "sub" (subject) is the ngo_id
     
-    client = get_supabase_client()
+    client = await get_async_supabase_client()
     
-    # ✅ OPTIMIZED: Single query with all needed fields for accurate calculations
+    # ✅ OPTIMIZED: Aggregated in Postgres, so the response size is constant per NGO
     try:
-        result = (
-            client.table(settings.supabase_stories_table)
-            .select("id, status, students_reached, completion_rate")
-            .eq("ngo_id", ngo_id)
-            .execute()
-        )
+        result = await client.rpc("dashboard_stats", {"p_ngo_id": ngo_id}).execute()
     except APIError as error:
-        raise_supabase_http_error(error)
+        if error.code == "22P02":  # ngo_id is not a uuid, so it owns no stories
+            result = None
+        else:
+            raise_supabase_http_error(error)
     
-    rows = result.data or []
+    row = result.data[0] if result and result.data else {}
     
     # ✅ ACCURATE COUNTS
-    stories_created = len(rows)  # Total stories (all statuses)
-    published_count = sum(1 for row in rows if row.get("status") == "published")
+    stories_created = row.get("stories_created", 0) or 0  # Total stories (all statuses)
+    published_count = row.get("published_count", 0) or 0
     draft_count = stories_created - published_count
     
     # ✅ SUM students reached across all stories
-    students_reached = sum((row.get("students_reached", 0) or 0) for row in rows)
+    students_reached = row.get("students_reached_total", 0) or 0
     
     # ✅ WEIGHTED completion rate: (sum of completion_rate * students_reached) / total_students_reached
     if students_reached > 0:
-        weighted_completion = sum(
-            (row.get("completion_rate", 0) or 0) * (row.get("students_reached", 0) or 0)
-            for row in rows
-        ) / students_reached
-        completion_rate = int(weighted_completion)
+        completion_rate = int((row.get("weighted_completion_sum", 0) or 0) / students_reached)
     else:
         # No students reached yet, default to 0
         completion_rate = 0
@@ -1022,12 +1210,12 @@ def get_dashboard_stats(user: dict = Depends(get_current_ngo)) -> DashboardStats
         f"students_reached={students_reached}, completion_rate={completion_rate}%"
     )
 
-    return DashboardStats(
-        storiesCreated=stories_created,
-        studentsReached=students_reached,
-        completionRate=completion_rate,
-        activeSessions=0,  # Placeholder: implement session tracking later
-    )
+    return ORJSONResponse({
+        "storiesCreated": stories_created,
+        "studentsReached": students_reached,
+        "completionRate": completion_rate,
+        "activeSessions": 0,  # Placeholder: implement session tracking later
+    })
 
 
 app.include_router(router)
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""Shared HTTP client for the local Ollama server.
+
+Story generation and the safety critic's LLM review both POST to
+/api/generate several times per story; one pooled async client keeps those
+connections alive and lets the event loop serve other requests while a
+model is generating.
+
+A small circuit breaker sits in front of the client: after
+OLLAMA_BREAKER_FAILURE_THRESHOLD consecutive failures (timeouts, refused
+connections, error statuses) calls fail immediately for
+OLLAMA_BREAKER_COOLDOWN_SECONDS instead of each waiting out the full
+request timeout against a stuck or overloaded server.
+"""
+
+import time
+from typing import Any
+
+import httpx
+import orjson
+
+from app.config import get_settings
+
+_CLIENT: httpx.AsyncClient | None = None
+
+# Breaker state; only touched from the event loop, with no await between
+# the check and the update, so it needs no lock
+_CONSECUTIVE_FAILURES = 0
+_OPEN_UNTIL = 0.0
+
+
+class OllamaUnavailableError(RuntimeError):
+    """Raised without contacting Ollama while the circuit breaker is open."""
+
+
+def get_ollama_client() -> httpx.AsyncClient:
+    global _CLIENT
+    if _CLIENT is None:
+        settings = get_settings()
+        _CLIENT = httpx.AsyncClient(
+            timeout=settings.ollama_request_timeout_seconds,
+            # retries only cover failed connects, so a slow generation is never sent twice
+            transport=httpx.AsyncHTTPTransport(
+                retries=2,
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=4),
+            ),
+        )
+    return _CLIENT
+
+
+async def ollama_generate(request_payload: dict[str, Any]) -> dict[str, Any]:
+    """
+    POST to /api/generate and return the decoded response body.
+
+    Raises OllamaUnavailableError while the circuit breaker is open,
+    httpx.HTTPError when Ollama is unreachable or answers with an error
+    status, and ValueError when the body is not JSON.
+    """
+    global _CONSECUTIVE_FAILURES, _OPEN_UNTIL
+    if time.monotonic() < _OPEN_UNTIL:
+        raise OllamaUnavailableError("Ollama is failing repeatedly; skipping calls until the cooldown ends")
+
+    try:
+        response = await get_ollama_client().post(
+            get_settings().ollama_generate_endpoint,
+            content=orjson.dumps(request_payload),
+            headers={"Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+    except httpx.HTTPError:
+        settings = get_settings()
+        _CONSECUTIVE_FAILURES += 1
+        threshold = settings.ollama_breaker_failure_threshold
+        if threshold > 0 and _CONSECUTIVE_FAILURES >= threshold:
+            _OPEN_UNTIL = time.monotonic() + settings.ollama_breaker_cooldown_seconds
+            _CONSECUTIVE_FAILURES = 0
+        raise
+
+    _CONSECUTIVE_FAILURES = 0
+    return orjson.loads(response.content)
+
+
+async def close_ollama_client() -> None:
+    global _CLIENT
+    client, _CLIENT = _CLIENT, None
+    if client is not None:
+        await client.aclose()
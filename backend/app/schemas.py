@@ -4,7 +4,7 @@ from typing import Literal
 from pydantic import BaseModel, Field
 
 
-StoryStatus = Literal["draft", "published"]
+StoryStatus = Literal["generating", "failed", "draft", "published"]
 
 
 class Choice(BaseModel):
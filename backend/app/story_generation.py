@@ -1,11 +1,15 @@
 import json
 import re
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
 from typing import Any
-from urllib import error as url_error
-from urllib import request as url_request
+
+import httpx
+import orjson
 
 from app.config import get_settings
+from app.ollama_client import OllamaUnavailableError, ollama_generate
 from app.schemas import StoryCreateRequest
 
 
@@ -19,24 +23,23 @@ class StoryGenerationError(RuntimeError):
     pass
 
 
+_DIGIT_RE = re.compile(r"\d+")
+# raw_decode parses the first JSON value at an offset and ignores whatever
+# follows, so chatter around the object needs no brace matching or regex
+_JSON_DECODER = json.JSONDecoder()
+
+
 def _extract_first_json_object(text: str) -> dict[str, Any]:
     text = text.strip()
     if not text:
         raise StoryGenerationError("Model returned empty response")
 
-    try:
-        parsed = json.loads(text)
-        if isinstance(parsed, dict):
-            return parsed
-    except json.JSONDecodeError:
-        pass
-
-    match = re.search(r"\{.*\}", text, flags=re.DOTALL)
-    if not match:
+    start = text.find("{")
+    if start < 0:
         raise StoryGenerationError("No JSON object found in model response")
 
     try:
-        parsed = json.loads(match.group(0))
+        parsed, _ = _JSON_DECODER.raw_decode(text, start)
     except json.JSONDecodeError as exc:
         raise StoryGenerationError("Invalid JSON returned by model") from exc
 
@@ -45,9 +48,7 @@ def _extract_first_json_object(text: str) -> dict[str, Any]:
     return parsed
 
 
-def _ollama_generate_json(model: str, prompt: str) -> dict[str, Any]:
-    settings = get_settings()
-    endpoint = f"{settings.ollama_base_url.rstrip('/')}/api/generate"
+async def _ollama_generate_json(model: str, prompt: str) -> dict[str, Any]:
     payload = {
         "model": model,
         "prompt": prompt,
@@ -57,34 +58,32 @@ def _ollama_generate_json(model: str, prompt: str) -> dict[str, Any]:
             "temperature": 0.3,
         },
     }
-    data = json.dumps(payload).encode("utf-8")
-    req = url_request.Request(
-        endpoint,
-        data=data,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
-
     try:
-        with url_request.urlopen(req, timeout=settings.ollama_request_timeout_seconds) as response:
-            raw = response.read().decode("utf-8")
-    except (url_error.URLError, TimeoutError) as exc:
+        response_payload = await ollama_generate(payload)
+    except httpx.HTTPError as exc:
         raise StoryGenerationError("Cannot reach Ollama server") from exc
-
-    try:
-        response_payload = json.loads(raw)
-    except json.JSONDecodeError as exc:
+    except OllamaUnavailableError as exc:
+        raise StoryGenerationError(str(exc)) from exc
+    except ValueError as exc:
         raise StoryGenerationError("Invalid response from Ollama") from exc
 
     response_text = response_payload.get("response", "")
     if not isinstance(response_text, str):
         raise StoryGenerationError("Unexpected Ollama payload format")
 
+    # format="json" normally yields a clean object; only scan for one when it doesn't
+    try:
+        parsed = orjson.loads(response_text)
+    except orjson.JSONDecodeError:
+        parsed = None
+    if isinstance(parsed, dict):
+        return parsed
     return _extract_first_json_object(response_text)
 
 
+@lru_cache(maxsize=64)
 def _parse_age_value(age_group: str) -> int:
-    numbers = [int(n) for n in re.findall(r"\d+", age_group)]
+    numbers = [int(n) for n in _DIGIT_RE.findall(age_group)]
     if not numbers:
         return 8
     if len(numbers) == 1:
@@ -190,31 +189,37 @@ def _normalize_choices(raw_choices: Any) -> list[dict[str, Any]] | None:
     return normalized
 
 
+def _validate_one_slide(idx: int, raw_slide: Any) -> dict[str, Any] | None:
+    """Normalize one model slide, or None when it has to be skipped."""
+    if not isinstance(raw_slide, dict):
+        return None
+
+    text = raw_slide.get("text")
+    if not isinstance(text, str) or not text.strip():
+        return None
+
+    choices = _normalize_choices(raw_slide.get("choices"))
+    if choices and not any(choice["correct"] for choice in choices):
+        choices[0]["correct"] = True
+
+    return {
+        "position": idx + 1,
+        "text": text.strip(),
+        "choices": choices,
+    }
+
+
 def _validate_and_normalize_slides(raw_payload: dict[str, Any], payload: StoryCreateRequest) -> list[dict[str, Any]]:
     raw_slides = raw_payload.get("slides")
     if not isinstance(raw_slides, list) or not raw_slides:
         raise StoryGenerationError("Model did not return valid slides list")
 
-    slides: list[dict[str, Any]] = []
-    for idx, raw_slide in enumerate(raw_slides[:8]):
-        if not isinstance(raw_slide, dict):
-            continue
-
-        text = raw_slide.get("text")
-        if not isinstance(text, str) or not text.strip():
-            continue
-
-        choices = _normalize_choices(raw_slide.get("choices"))
-        if choices and not any(choice["correct"] for choice in choices):
-            choices[0]["correct"] = True
-
-        slides.append(
-            {
-                "position": idx + 1,
-                "text": text.strip(),
-                "choices": choices,
-            }
-        )
+    # islice: no copy of an over-long list just to look at its first 8 items
+    slides = [
+        slide
+        for slide in (_validate_one_slide(idx, raw_slide) for idx, raw_slide in enumerate(islice(raw_slides, 8)))
+        if slide is not None
+    ]
 
     if len(slides) < 3:
         raise StoryGenerationError("Model returned too few valid slides")
@@ -240,17 +245,31 @@ def _validate_and_normalize_slides(raw_payload: dict[str, Any], payload: StoryCr
     return slides
 
 
-def generate_story_with_ollama(payload: StoryCreateRequest) -> StoryGenerationResult:
+_PLANNER_PROMPT_PREFIX = (
+    "You are a planner that converts NGO input into child-safe structured context for a safety story. "
+    "Return ONLY valid JSON with this exact shape: "
+    '{"age": number, "location": string, "character": {"skin": string, "hair": string, "clothes": string}, "topic": string}. '
+    "Do not include markdown or extra keys.\n\n"
+    "NGO Input:\n"
+)
+
+_GENERATOR_PROMPT_PREFIX = (
+    "You generate branching, age-appropriate child safety stories as JSON. "
+    "Return ONLY valid JSON with this exact shape: "
+    '{"slides": [{"position": number, "text": string, "choices": null | [{"id": string, "text": string, "correct": boolean}]}]}. '
+    "Rules: 4 to 6 slides, simple language, at least one slide with exactly 2 choices (one correct=true and one correct=false), "
+    "no violence, focus on safe behavior and trusted adults, output in the requested language.\n\n"
+    "Story metadata:\n"
+)
+
+
+async def generate_story_with_ollama(payload: StoryCreateRequest) -> StoryGenerationResult:
     settings = get_settings()
     if not settings.ollama_enabled:
         raise StoryGenerationError("Ollama generation is disabled")
 
     planner_prompt = (
-        "You are a planner that converts NGO input into child-safe structured context for a safety story. "
-        "Return ONLY valid JSON with this exact shape: "
-        '{"age": number, "location": string, "character": {"skin": string, "hair": string, "clothes": string}, "topic": string}. '
-        "Do not include markdown or extra keys.\n\n"
-        f"NGO Input:\n"
+        f"{_PLANNER_PROMPT_PREFIX}"
         f"- title: {payload.title}\n"
         f"- topic: {payload.topic}\n"
         f"- age_group: {payload.ageGroup}\n"
@@ -261,26 +280,21 @@ def generate_story_with_ollama(payload: StoryCreateRequest) -> StoryGenerationRe
         f"- moral_lesson: {payload.moralLesson or 'not provided'}"
     )
 
-    planner_output = _ollama_generate_json(settings.ollama_model_planner, planner_prompt)
+    planner_output = await _ollama_generate_json(settings.ollama_model_planner, planner_prompt)
     context = _validate_context(planner_output, payload)
 
     generator_prompt = (
-        "You generate branching, age-appropriate child safety stories as JSON. "
-        "Return ONLY valid JSON with this exact shape: "
-        '{"slides": [{"position": number, "text": string, "choices": null | [{"id": string, "text": string, "correct": boolean}]}]}. '
-        "Rules: 4 to 6 slides, simple language, at least one slide with exactly 2 choices (one correct=true and one correct=false), "
-        "no violence, focus on safe behavior and trusted adults, output in the requested language.\n\n"
-        f"Story metadata:\n"
+        f"{_GENERATOR_PROMPT_PREFIX}"
         f"- title: {payload.title}\n"
         f"- topic: {payload.topic}\n"
         f"- age_group: {payload.ageGroup}\n"
         f"- language: {payload.language}\n"
         f"- moral_lesson: {payload.moralLesson or 'Use safe choices and tell a trusted adult.'}\n"
         f"- region_context: {payload.regionContext or 'not provided'}\n"
-        f"- context_json: {json.dumps(context)}"
+        f"- context_json: {orjson.dumps(context).decode()}"
     )
 
-    story_output = _ollama_generate_json(settings.ollama_model_story, generator_prompt)
+    story_output = await _ollama_generate_json(settings.ollama_model_story, generator_prompt)
     slides = _validate_and_normalize_slides(story_output, payload)
 
     return StoryGenerationResult(context=context, slides=slides)
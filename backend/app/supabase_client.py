@@ -1,10 +1,33 @@
-from supabase import Client, create_client
+import asyncio
+
+from supabase import AsyncClient, acreate_client
 
 from app.config import get_settings
 
+# One client per process: its PostgREST session keeps a pooled httpx connection
+# (keep-alive + TLS reuse) instead of handshaking on every request
+_ASYNC_CLIENT: AsyncClient | None = None
+_ASYNC_CLIENT_LOCK = asyncio.Lock()
+
+
+async def get_async_supabase_client() -> AsyncClient:
+    """Shared async client for route handlers; created on first use (or in the app lifespan)."""
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is not None:
+        return _ASYNC_CLIENT
 
-def get_supabase_client() -> Client:
     settings = get_settings()
     if not settings.supabase_url or not settings.supabase_key:
         raise RuntimeError("Supabase is not configured. Set SUPABASE_URL and SUPABASE_ANON_KEY (or SUPABASE_SERVICE_ROLE_KEY) in backend/.env")
-    return create_client(settings.supabase_url, settings.supabase_key)
\ No newline at end of file
+    async with _ASYNC_CLIENT_LOCK:
+        if _ASYNC_CLIENT is None:
+            _ASYNC_CLIENT = await acreate_client(settings.supabase_url, settings.supabase_key)
+    return _ASYNC_CLIENT
+
+
+async def close_async_supabase_client() -> None:
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None:
+        return
+    client, _ASYNC_CLIENT = _ASYNC_CLIENT, None
+    await client.postgrest.aclose()
@@ -1,4 +1,5 @@
 create extension if not exists pgcrypto;
+create extension if not exists pg_trgm;
 
 create table if not exists public.stories (
   id uuid primary key default gen_random_uuid(),
@@ -31,6 +32,24 @@ create table if not exists public.story_slides (
 create unique index if not exists story_slides_story_position_idx
   on public.story_slides (story_id, position);
 
+-- NGO-scoped story reads: newest-first listing/search and per-status counts.
+-- On a large existing table, run these as CREATE INDEX CONCURRENTLY outside a transaction.
+create index if not exists stories_ngo_created_at_idx
+  on public.stories (ngo_id, created_at desc);
+
+create index if not exists stories_ngo_status_idx
+  on public.stories (ngo_id, status);
+
+-- search_stories filters with title/description ILIKE '%q%'; trigram GIN indexes let
+-- Postgres answer leading-wildcard patterns with a bitmap OR instead of a seq scan.
+-- One index per column: an index on (title || ' ' || description) would not match
+-- the separate ILIKE predicates PostgREST generates.
+create index if not exists stories_title_trgm_idx
+  on public.stories using gin (title gin_trgm_ops);
+
+create index if not exists stories_description_trgm_idx
+  on public.stories using gin (description gin_trgm_ops);
+
 create table if not exists public.student_profiles (
   id uuid primary key default gen_random_uuid(),
   name text not null,
@@ -47,6 +66,109 @@ create table if not exists public.ngo_accounts (
   created_at timestamptz not null default timezone('utc', now())
 );
 
+-- create_story relies on this FK (error 23503) instead of looking the NGO up first.
+-- Rows whose ngo_id is not the id of an existing NGO account would make the cast or
+-- the FK fail halfway, so they are reported up front and must be fixed or removed
+-- (the hint lists them) before the script is re-run. Deleting an NGO account with
+-- stories is rejected rather than cascading to its stories.
+do $$
+declare
+  bad_rows bigint;
+begin
+  if exists (
+    select 1 from information_schema.columns
+    where table_schema = 'public' and table_name = 'stories'
+      and column_name = 'ngo_id' and data_type <> 'uuid'
+  ) then
+    select count(*) into bad_rows
+    from public.stories as s
+    where not exists (select 1 from public.ngo_accounts as a where a.id::text = lower(s.ngo_id));
+
+    if bad_rows > 0 then
+      raise exception 'public.stories has % row(s) whose ngo_id is not an existing ngo_accounts id', bad_rows
+        using hint = 'List them with: select id, ngo_id from public.stories as s '
+          || 'where not exists (select 1 from public.ngo_accounts as a where a.id::text = lower(s.ngo_id));';
+    end if;
+
+    alter table public.stories
+      alter column ngo_id type uuid using lower(ngo_id)::uuid;
+  end if;
+
+  -- Earlier versions of this script created the FK with on delete cascade
+  if exists (
+    select 1 from pg_constraint
+    where conname = 'stories_ngo_id_fkey'
+      and conrelid = 'public.stories'::regclass
+      and confdeltype = 'c'
+  ) then
+    alter table public.stories drop constraint stories_ngo_id_fkey;
+  end if;
+
+  if not exists (
+    select 1 from pg_constraint
+    where conname = 'stories_ngo_id_fkey' and conrelid = 'public.stories'::regclass
+  ) then
+    alter table public.stories
+      add constraint stories_ngo_id_fkey
+      foreign key (ngo_id) references public.ngo_accounts(id);
+  end if;
+end $$;
+
+-- Inserts a story and its slides in one transaction so create_story needs a single
+-- round trip and can never leave a story row without slides behind.
+create or replace function public.create_story_with_slides(story jsonb, slides jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+  story_row public.stories;
+  slide_rows jsonb;
+begin
+  insert into public.stories (
+    id, ngo_id, title, topic, age_group, language, region_context,
+    description, moral_lesson, character_count, status
+  )
+  select
+    s.id, s.ngo_id, s.title, s.topic, s.age_group, s.language, s.region_context,
+    s.description, s.moral_lesson, coalesce(s.character_count, 1), coalesce(s.status, 'draft')
+  from jsonb_populate_record(null::public.stories, story) as s
+  returning * into story_row;
+
+  with inserted as (
+    insert into public.story_slides (story_id, position, image_url, text, choices)
+    select story_row.id, sl.position, sl.image_url, sl.text, sl.choices
+    from jsonb_populate_recordset(null::public.story_slides, slides) as sl
+    returning *
+  )
+  select coalesce(jsonb_agg(to_jsonb(inserted) order by inserted.position), '[]'::jsonb)
+    into slide_rows
+  from inserted;
+
+  return jsonb_build_object('story', to_jsonb(story_row), 'slides', slide_rows);
+end;
+$$;
+
+-- Aggregates dashboard numbers server-side; the API divides the weighted sum
+-- by students_reached_total to get the completion rate.
+create or replace function public.dashboard_stats(p_ngo_id uuid)
+returns table (
+  stories_created bigint,
+  published_count bigint,
+  students_reached_total bigint,
+  weighted_completion_sum bigint
+)
+language sql
+stable
+as $$
+  select
+    count(*),
+    count(*) filter (where s.status = 'published'),
+    coalesce(sum(s.students_reached), 0)::bigint,
+    coalesce(sum(s.completion_rate::bigint * s.students_reached), 0)::bigint
+  from public.stories as s
+  where s.ngo_id = p_ngo_id;
+$$;
+
 alter table public.ngo_accounts enable row level security;
 alter table public.student_profiles enable row level security;
 
@@ -0,0 +1,66 @@
+import types
+
+import pytest
+
+import app.main as main
+from app.auth import create_access_token
+
+
+class _FakeQuery:
+    """Records the PostgREST builder chain; execute() asks the test's responder for rows."""
+
+    def __init__(self, client, target):
+        self.client = client
+        self.target = target
+        self.calls = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+
+        return record
+
+    async def execute(self):
+        self.client.log.append((self.target, self.calls))
+        data = self.client.responder(self.target, self.calls)
+        if isinstance(data, Exception):
+            raise data
+        count = len(data) if isinstance(data, list) else None
+        return types.SimpleNamespace(data=data, count=count)
+
+
+class FakeSupabase:
+    def __init__(self, responder):
+        self.responder = responder
+        self.log = []
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        query = _FakeQuery(self, f"rpc:{name}")
+        query.calls.append(("rpc", (params,), {}))
+        return query
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    """Install a fake async Supabase client; call it with responder(target, calls) -> data."""
+
+    def install(responder):
+        client = FakeSupabase(responder)
+
+        async def get_client():
+            return client
+
+        monkeypatch.setattr(main, "get_async_supabase_client", get_client)
+        return client
+
+    return install
+
+
+@pytest.fixture
+def ngo_headers():
+    token = create_access_token("00000000-0000-0000-0000-0000000000aa", "ngo@example.org", "Example NGO")
+    return {"Authorization": f"Bearer {token}"}
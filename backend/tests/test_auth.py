@@ -0,0 +1,151 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.requests import Request
+
+import app.auth as auth
+from app.auth import (
+    _fast_decode_hs256,
+    create_access_token,
+    get_current_ngo,
+    get_current_user,
+    hash_password,
+    verify_access_token,
+    verify_password,
+)
+from app.config import get_settings
+
+SECRET = get_settings().jwt_secret_key
+NOW = int(time.time())
+
+
+def _token(payload, headers=None, key=SECRET):
+    return jwt.encode(payload, key, algorithm="HS256", headers=headers)
+
+
+def _signed(header, payload):
+    """HS256 token built by hand, for headers jwt.encode refuses to emit."""
+
+    def b64(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).rstrip(b"=")
+
+    signing_input = b64(header) + b"." + b64(payload)
+    signature = hmac.new(SECRET.encode(), signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + base64.urlsafe_b64encode(signature).rstrip(b"=")).decode()
+
+
+def _outcome(decode, token):
+    try:
+        return "ok", decode(token)
+    except jwt.InvalidTokenError:
+        return "rejected", None
+
+
+def _pyjwt(token):
+    return jwt.decode(token, SECRET, algorithms=["HS256"])
+
+
+CASES = {
+    "valid": _token({"sub": "u1", "exp": NOW + 60}),
+    "no_exp": _token({"sub": "u1"}),
+    "expired": _token({"sub": "u1", "exp": NOW - 1}),
+    "exp_numeric_string": _token({"exp": str(NOW + 60)}),
+    "exp_float": _token({"exp": NOW + 60.5}),
+    "exp_not_a_number": _token({"exp": "soon"}),
+    "iat_past": _token({"iat": NOW - 10, "exp": NOW + 60}),
+    "iat_future": _token({"iat": NOW + 600}),
+    "iat_not_a_number": _token({"iat": "then"}),
+    "nbf_future": _token({"nbf": NOW + 600}),
+    "sub_int": _token({"sub": 5, "exp": NOW + 60}),
+    "jti_str": _token({"jti": "abc", "exp": NOW + 60}),
+    "jti_int": _token({"jti": 7, "exp": NOW + 60}),
+    "aud_str": _token({"aud": "someone", "exp": NOW + 60}),
+    "aud_list": _token({"aud": ["someone"], "exp": NOW + 60}),
+    "aud_empty": _token({"aud": [], "exp": NOW + 60}),
+    "kid_str": _token({"exp": NOW + 60}, headers={"kid": "k1"}),
+    "kid_int": _signed({"alg": "HS256", "typ": "JWT", "kid": 1}, {"exp": NOW + 60}),
+    "alg_missing": _signed({"typ": "JWT"}, {"exp": NOW + 60}),
+    "wrong_key": _token({"exp": NOW + 60}, key=SECRET + "x"),
+    "wrong_alg": _signed({"alg": "HS512", "typ": "JWT"}, {"exp": NOW + 60}),
+    "tampered": _token({"sub": "u1"})[:-2] + "AA",
+    "two_segments": "abc.def",
+    "garbage": "not a token",
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_fast_decode_matches_pyjwt(name):
+    token = CASES[name]
+    assert _outcome(_fast_decode_hs256, token) == _outcome(_pyjwt, token)
+
+
+def test_non_string_subject_is_unauthorized():
+    with pytest.raises(HTTPException) as excinfo:
+        verify_access_token(CASES["sub_int"])
+    assert excinfo.value.status_code == 401
+
+
+def test_issued_token_round_trips():
+    payload = verify_access_token(create_access_token("ngo-1", "a@b.org", "Org"))
+    assert payload["sub"] == "ngo-1"
+    assert payload["role"] == "ngo"
+
+
+def test_rejected_token_is_cached_as_unauthorized(monkeypatch):
+    calls = []
+
+    def counting_decode(token):
+        calls.append(token)
+        return _fast_decode_hs256(token)
+
+    monkeypatch.setattr(auth, "_decode_token", counting_decode)
+    token = _token({"sub": "cached", "exp": NOW - 5})
+    raised = []
+    for _ in range(2):
+        with pytest.raises(HTTPException) as excinfo:
+            verify_access_token(token)
+        assert excinfo.value.status_code == 401
+        raised.append(excinfo.value)
+    assert calls == [token]
+    # Concurrent raises must not share one exception's traceback/context
+    assert raised[0] is not raised[1]
+
+
+def test_wrong_role_gets_a_fresh_forbidden_error():
+    raised = []
+    for _ in range(2):
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(get_current_ngo({"sub": "x", "role": "student"}))
+        assert excinfo.value.status_code == 403
+        assert excinfo.value.detail == "Only NGO accounts can access this resource"
+        raised.append(excinfo.value)
+    assert raised[0] is not raised[1]
+
+
+def test_get_current_user_stores_the_verified_payload_on_the_request():
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token("ngo-2", "b@c.org", "Org"))
+    payload = asyncio.run(get_current_user(request, credentials))
+    assert payload["sub"] == "ngo-2"
+    assert request.state.user is payload
+
+
+@pytest.mark.parametrize("hashed", [None, "", b""])
+def test_missing_password_hash_never_verifies(hashed):
+    assert verify_password("mypassword123", hashed) is False
+
+
+def test_password_round_trips():
+    hashed = hash_password("mypassword123")
+    assert verify_password("mypassword123", hashed)
+    assert not verify_password("wrongpassword", hashed)
+    # Every hash gets its own salt
+    assert hash_password("mypassword123") != hashed
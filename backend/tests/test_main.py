@@ -0,0 +1,110 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from starlette.requests import Request
+
+import app.main as main
+from app.auth import AuthMiddleware
+from app.main import app, conditional_json_response, to_slide, to_slide_dict, to_story, to_story_dict
+from app.safety_critic import SafetyCriticResult
+from app.schemas import StoryCreateRequest
+from app.story_generation import StoryGenerationError
+
+STORY_ROW = {
+    "id": "s1",
+    "title": "Road safety",
+    "topic": "road",
+    "age_group": "6-8",
+    "language": "en",
+    "cover_image_url": None,
+    "status": "draft",
+    "students_reached": None,
+    "completion_rate": 40,
+    "created_at": "2024-01-01T00:00:00+00:00",
+}
+SLIDE_ROW = {
+    "position": 2,
+    "image_url": None,
+    "text": "What now?",
+    "choices": [{"id": "a", "text": "Tell a teacher", "correct": True}],
+}
+
+
+def test_each_middleware_is_registered_once():
+    counts = Counter((m.cls, m.kwargs.get("dispatch").__class__) for m in app.user_middleware)
+    assert all(count == 1 for count in counts.values()), counts
+
+
+def test_tokens_are_only_verified_by_the_route_dependency():
+    # get_current_user is the single verifier; no middleware decodes tokens on every request
+    assert not any(isinstance(m.kwargs.get("dispatch"), AuthMiddleware) for m in app.user_middleware)
+
+
+def test_model_converters_build_on_the_dict_converters():
+    assert to_story(STORY_ROW).model_dump() == to_story_dict(STORY_ROW)
+    assert to_slide(SLIDE_ROW).model_dump() == to_slide_dict(SLIDE_ROW)
+
+
+@pytest.mark.parametrize("choices", [None, []])
+def test_slide_choices_are_passed_through(choices):
+    row = {**SLIDE_ROW, "choices": choices}
+    assert to_slide_dict(row)["choices"] == choices
+    assert to_slide(row).choices == choices
+
+
+def _request(headers=None):
+    raw = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_conditional_response_revalidates_with_etag():
+    first = conditional_json_response(_request(), {"status": "generating"})
+    assert first.status_code == 200
+    # Browsers must revalidate, so a polled "generating" story is never served stale
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    etag = first.headers["etag"]
+    unchanged = conditional_json_response(_request({"If-None-Match": etag}), {"status": "generating"})
+    assert unchanged.status_code == 304
+    assert unchanged.body == b""
+
+    changed = conditional_json_response(_request({"If-None-Match": etag}), {"status": "draft"})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_review_task_is_stopped_when_image_rendering_crashes(monkeypatch):
+    review_cancelled = []
+
+    async def no_generation(payload):
+        raise StoryGenerationError("disabled in tests")
+
+    async def slow_review(payload, slides):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            review_cancelled.append(True)
+            raise
+
+    def broken_images(payload, story_id, slides):
+        raise RuntimeError("renderer crashed")
+
+    monkeypatch.setattr(main, "generate_story_with_ollama", no_generation)
+    monkeypatch.setattr(main, "apply_safety_critic", lambda payload, slides: SafetyCriticResult(slides, ["x"]))
+    monkeypatch.setattr(main, "run_optional_llm_review", slow_review)
+    monkeypatch.setattr(main, "generate_story_images", broken_images)
+    monkeypatch.setattr(main.settings, "ollama_fallback_to_default", True)
+
+    payload = StoryCreateRequest(
+        title="Park day", topic="Strangers", ageGroup="6-8", language="en", characterCount=1, description="d"
+    )
+
+    async def run():
+        with pytest.raises(RuntimeError, match="renderer crashed"):
+            await main.build_story_slides(payload, "story-1")
+        # Nothing may be left running once build_story_slides has failed
+        assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
+
+    asyncio.run(run())
+    assert review_cancelled == [True]
@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import ollama_client
+from app.config import get_settings
+from app.ollama_client import OllamaUnavailableError, ollama_generate
+
+
+@pytest.fixture
+def ollama_transport(monkeypatch):
+    """Route the shared Ollama client through a handler; returns the list of requests seen."""
+    requests = []
+
+    def install(handler):
+        def record(request):
+            requests.append(request)
+            return handler(request)
+
+        monkeypatch.setattr(ollama_client, "_CLIENT", httpx.AsyncClient(transport=httpx.MockTransport(record)))
+        monkeypatch.setattr(ollama_client, "_CONSECUTIVE_FAILURES", 0)
+        monkeypatch.setattr(ollama_client, "_OPEN_UNTIL", 0.0)
+        monkeypatch.setattr(get_settings(), "ollama_breaker_failure_threshold", 3)
+        return requests
+
+    return install
+
+
+def _call_times(count):
+    async def run():
+        outcomes = []
+        for _ in range(count):
+            try:
+                await ollama_generate({"model": "m", "prompt": "p"})
+                outcomes.append("ok")
+            except (httpx.HTTPError, OllamaUnavailableError) as error:
+                outcomes.append(type(error).__name__)
+        return outcomes
+
+    return asyncio.run(run())
+
+
+def test_breaker_opens_after_consecutive_failures(ollama_transport):
+    def timeout(request):
+        raise httpx.ReadTimeout("slow model")
+
+    requests = ollama_transport(timeout)
+
+    outcomes = _call_times(5)
+
+    assert outcomes == ["ReadTimeout"] * 3 + ["OllamaUnavailableError"] * 2
+    assert len(requests) == 3
+
+
+def test_success_resets_the_failure_count(ollama_transport):
+    replies = iter([503, 200, 503, 503, 200])
+
+    def flaky(request):
+        return httpx.Response(next(replies), json={"response": "{}"})
+
+    requests = ollama_transport(flaky)
+
+    assert _call_times(5) == ["HTTPStatusError", "ok", "HTTPStatusError", "HTTPStatusError", "ok"]
+    assert str(requests[0].url) == get_settings().ollama_generate_endpoint
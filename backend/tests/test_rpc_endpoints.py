@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+import app.main as main
+from app.main import app
+
+client = TestClient(app)
+
+NGO_ID = "00000000-0000-0000-0000-0000000000aa"
+STORY_BODY = {
+    "title": "Water Safety",
+    "topic": "Swimming",
+    "ageGroup": "6-8",
+    "language": "English",
+    "characterCount": 1,
+    "description": "Learn water safety",
+}
+
+
+@pytest.fixture(autouse=True)
+def offline_generation(monkeypatch):
+    # Default slides and placeholder images: no Ollama or Stable Diffusion in tests
+    monkeypatch.setattr(main.settings, "ollama_enabled", False)
+    monkeypatch.setattr(main.settings, "ollama_fallback_to_default", True)
+    monkeypatch.setattr(main.settings, "story_generation_in_background", False)
+
+
+def _echo_created_story(target, calls):
+    (params,) = calls[0][1]
+    story = dict(params["story"], students_reached=0, completion_rate=0, created_at="2024-01-01T00:00:00+00:00")
+    return {"story": story, "slides": params["slides"]}
+
+
+def test_create_story_writes_story_and_slides_in_one_rpc(fake_supabase, ngo_headers):
+    fake = fake_supabase(_echo_created_story)
+
+    response = client.post("/api/stories", json=STORY_BODY, headers=ngo_headers)
+
+    assert response.status_code == 200
+    assert [target for target, _ in fake.log] == ["rpc:create_story_with_slides"]
+    (params,) = fake.log[0][1][0][1]
+    assert params["story"]["ngo_id"] == NGO_ID
+    assert params["story"]["status"] == "draft"
+    assert [slide["position"] for slide in params["slides"]] == list(range(1, len(params["slides"]) + 1))
+    body = response.json()
+    assert body["story"]["id"] == params["story"]["id"]
+    assert len(body["slides"]) == len(params["slides"])
+
+
+@pytest.mark.parametrize("code", ["23503", "22P02"])
+def test_create_story_for_unknown_ngo_is_forbidden(fake_supabase, ngo_headers, code):
+    fake_supabase(lambda target, calls: APIError({"code": code, "message": "rejected"}))
+    response = client.post("/api/stories", json=STORY_BODY, headers=ngo_headers)
+    assert response.status_code == 403
+
+
+def test_dashboard_stats_come_from_one_rpc(fake_supabase, ngo_headers):
+    row = {"stories_created": 4, "published_count": 1, "students_reached_total": 30, "weighted_completion_sum": 1500}
+    fake = fake_supabase(lambda target, calls: [row])
+
+    response = client.get("/api/dashboard/stats", headers=ngo_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"storiesCreated": 4, "studentsReached": 30, "completionRate": 50, "activeSessions": 0}
+    assert fake.log == [("rpc:dashboard_stats", [("rpc", ({"p_ngo_id": NGO_ID},), {})])]
+
+
+def test_dashboard_stats_for_non_uuid_ngo_are_zero(fake_supabase, ngo_headers):
+    fake_supabase(lambda target, calls: APIError({"code": "22P02", "message": "invalid input syntax for type uuid"}))
+    response = client.get("/api/dashboard/stats", headers=ngo_headers)
+    assert response.status_code == 200
+    assert response.json() == {"storiesCreated": 0, "studentsReached": 0, "completionRate": 0, "activeSessions": 0}
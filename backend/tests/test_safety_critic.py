@@ -0,0 +1,96 @@
+import re
+
+import pytest
+
+from app.safety_critic import (
+    UNSAFE_REPLACEMENTS,
+    _count_scary_terms,
+    _sanitize_text,
+    _sanitize_texts,
+    apply_safety_critic,
+)
+from app.schemas import StoryCreateRequest
+
+PAYLOAD = StoryCreateRequest(
+    title="Park day", topic="Strangers", ageGroup="6-8", language="en", characterCount=1, description="d"
+)
+
+TEXTS = [
+    "The child walks home.",
+    "Killing, KILL and kill-switch",
+    "A knife, a GUN and a weapon.",
+    "ſex and kıll and KİLL",  # Unicode case variants the IGNORECASE regex also matches
+    "skill bloodhound deadline",
+    "  Blood  ",
+    "",
+]
+
+
+def _per_term_sanitize(text):
+    """One IGNORECASE pass per table term, as the critic originally worked."""
+    changes = []
+    for bad, replacement in UNSAFE_REPLACEMENTS.items():
+        pattern = re.compile(rf"\b{re.escape(bad)}\b", flags=re.IGNORECASE)
+        if pattern.search(text):
+            text = pattern.sub(replacement, text)
+            changes.append(f"replaced unsafe term '{bad}'")
+    return text.strip(), changes
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_sanitize_text_matches_per_term_passes(text):
+    assert _sanitize_text(text) == _per_term_sanitize(text)
+
+
+def test_batch_sanitize_matches_single_text():
+    assert _sanitize_texts(TEXTS) == [_sanitize_text(text) for text in TEXTS]
+    # A text containing the batch separator still comes back unsplit
+    assert _sanitize_texts(["a\x1eblood", "x"]) == [_sanitize_text("a\x1eblood"), ("x", [])]
+
+
+def test_count_scary_terms_counts_distinct_whole_words():
+    assert _count_scary_terms("blood, blood and a gun") == 2
+    assert _count_scary_terms("bloodhound and a shotgun") == 0
+
+
+def test_unicode_case_variants_do_not_break_story_creation():
+    result = apply_safety_critic(
+        PAYLOAD,
+        [
+            {"text": "ſex"},
+            {"text": "kıll it", "choices": [{"text": "KİLL"}, {"text": "Tell a teacher"}]},
+            {"text": "Done."},
+        ],
+    )
+    assert result.slides[0]["text"] == "inappropriate"
+    assert result.slides[1]["choices"][0]["text"] == "hurt"
+
+
+def test_clean_story_skips_llm_review():
+    result = apply_safety_critic(
+        PAYLOAD,
+        [
+            {"text": "A stranger offers sweets."},
+            {
+                "text": "What should you do?",
+                "choices": [{"text": "Tell a teacher", "correct": True}, {"text": "Go along", "correct": False}],
+            },
+            {"text": "Everyone is safe."},
+        ],
+    )
+    assert result.issues == []
+    assert result.needs_review is False
+    assert all("_lower" not in slide for slide in result.slides)
+
+
+def test_missing_trusted_adult_is_added_and_flags_review():
+    result = apply_safety_critic(
+        PAYLOAD,
+        [
+            {"text": "One."},
+            {"text": "Pick one.", "choices": [{"text": "Walk away", "correct": True}, {"text": "Stay", "correct": False}]},
+            {"text": "Three."},
+        ],
+    )
+    assert "trusted adult" in result.slides[-1]["text"]
+    assert result.needs_review is True
@@ -0,0 +1,96 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, decode_story_cursor, encode_story_cursor
+
+client = TestClient(app)
+
+
+def _story_row(index):
+    return {
+        "id": str(uuid.UUID(int=index)),
+        "title": f"Story {index}",
+        "topic": "road",
+        "age_group": "6-8",
+        "language": "en",
+        "cover_image_url": None,
+        "status": "published",
+        "students_reached": 0,
+        "completion_rate": 0,
+        "created_at": f"2024-01-0{index}T00:00:00+00:00",
+    }
+
+
+def test_story_cursor_round_trips():
+    row = _story_row(3)
+    assert decode_story_cursor(encode_story_cursor(row)) == (row["created_at"], row["id"])
+
+
+@pytest.mark.parametrize("cursor", ["zzz", "bm90LWEtY3Vyc29y", encode_story_cursor({"created_at": "yesterday", "id": "x"})])
+def test_invalid_cursor_is_rejected(fake_supabase, cursor):
+    fake_supabase(lambda target, calls: [])
+    response = client.get("/api/stories", params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_full_page_returns_a_cursor_for_the_next_keyset_page(fake_supabase):
+    fake = fake_supabase(lambda target, calls: [_story_row(i) for i in (3, 2)])
+
+    first = client.get("/api/stories", params={"limit": 2})
+    assert first.status_code == 200
+    cursor = first.headers["X-Next-Cursor"]
+    assert decode_story_cursor(cursor) == ("2024-01-02T00:00:00+00:00", str(uuid.UUID(int=2)))
+
+    client.get("/api/stories", params={"limit": 2, "cursor": cursor})
+    calls = fake.log[-1][1]
+    assert ("order", ("created_at",), {"desc": True}) in calls
+    assert ("order", ("id",), {"desc": True}) in calls
+    assert (
+        "or_",
+        (
+            'created_at.lt."2024-01-02T00:00:00+00:00",'
+            f'and(created_at.eq."2024-01-02T00:00:00+00:00",id.lt.{uuid.UUID(int=2)})',
+        ),
+        {},
+    ) in calls
+
+
+def test_short_page_has_no_cursor(fake_supabase):
+    fake_supabase(lambda target, calls: [_story_row(1)])
+    response = client.get("/api/stories", params={"limit": 2})
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+    assert [story["id"] for story in response.json()] == [str(uuid.UUID(int=1))]
+
+
+def _unescape(text):
+    """Drop one level of backslash escaping: PostgREST's for quoted values, then LIKE's."""
+    out, chars = [], iter(text)
+    for char in chars:
+        out.append(next(chars, "") if char == "\\" else char)
+    return "".join(out)
+
+
+@pytest.mark.parametrize("term", ["water", "100%", "snake_case", "back\\slash", 'say "hi"', "a,b.c(d)", "a*b"])
+def test_search_term_is_matched_literally(fake_supabase, ngo_headers, term):
+    fake = fake_supabase(lambda target, calls: [])
+    response = client.get("/api/stories/search", params={"q": term}, headers=ngo_headers)
+    assert response.status_code == 200
+
+    calls = fake.log[-1][1]
+    assert ("eq", ("ngo_id", "00000000-0000-0000-0000-0000000000aa"), {}) in calls
+    (search_filter,) = next(args for name, args, _ in calls if name == "or_")
+    prefix, suffix = 'title.ilike."%', '%",description.ilike."%'
+    assert search_filter.startswith(prefix)
+    quoted = search_filter[len(prefix) : search_filter.index(suffix)]
+    # Every quote inside the value is escaped, so the term cannot close it early
+    assert '"' not in quoted.replace('\\"', "")
+    like_pattern = _unescape(quoted)
+    # LIKE wildcards from the user only appear escaped, and unescaping gives the term back
+    # minus any *, which PostgREST would turn into a % wildcard
+    assert "*" not in quoted
+    assert _unescape(like_pattern) == term.replace("*", "")
+    assert "%" not in like_pattern.replace("\\%", "").replace("\\\\", "")
+    assert "_" not in like_pattern.replace("\\_", "").replace("\\\\", "")
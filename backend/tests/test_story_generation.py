@@ -0,0 +1,33 @@
+import pytest
+
+from app.story_generation import StoryGenerationError, _extract_first_json_object, _parse_age_value
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"slides": []}', {"slides": []}),
+        ('Sure! Here it is:\n{"a": {"b": 1}}\nHope that helps {really}.', {"a": {"b": 1}}),
+        ('{"text": "braces } and { in a string"} trailing', {"text": "braces } and { in a string"}),
+    ],
+)
+def test_extracts_first_json_object(text, expected):
+    assert _extract_first_json_object(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ("   ", "empty response"),
+        ("no json here", "No JSON object"),
+        ('{"a": ', "Invalid JSON"),
+    ],
+)
+def test_rejects_responses_without_a_json_object(text, message):
+    with pytest.raises(StoryGenerationError, match=message):
+        _extract_first_json_object(text)
+
+
+@pytest.mark.parametrize("age_group, expected", [("6-8", 7), ("10", 10), ("Ages 9 to 12", 10), ("kids", 8)])
+def test_parse_age_value(age_group, expected):
+    assert _parse_age_value(age_group) == expected
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.main import app, complete_story_generation
+from app.schemas import StoryCreateRequest
+
+client = TestClient(app)
+
+NGO_ID = "00000000-0000-0000-0000-0000000000aa"
+STORY_ID = "00000000-0000-0000-0000-000000000001"
+PAYLOAD = StoryCreateRequest(
+    title="Water Safety", topic="Swimming", ageGroup="6-8", language="English", characterCount=1, description="d"
+)
+
+
+class StoriesTable:
+    """One-table stand-in that applies the eq/in_ filters of select and update chains."""
+
+    def __init__(self, status):
+        self.rows = [
+            {
+                "id": STORY_ID,
+                "ngo_id": NGO_ID,
+                "title": "Water Safety",
+                "topic": "Swimming",
+                "age_group": "6-8",
+                "language": "English",
+                "status": status,
+                "created_at": "2024-01-01T00:00:00+00:00",
+            }
+        ]
+
+    def __call__(self, target, calls):
+        if target != "stories":
+            return []
+        matching = [row for row in self.rows if all(self._matches(row, name, args) for name, args, _ in calls)]
+        for name, args, _ in calls:
+            if name == "update":
+                for row in matching:
+                    row.update(args[0])
+        return [dict(row) for row in matching]
+
+    @staticmethod
+    def _matches(row, name, args):
+        if name == "eq":
+            return str(row[args[0]]) == str(args[1])
+        if name == "in_":
+            return row[args[0]] in args[1]
+        return True
+
+
+@pytest.fixture(autouse=True)
+def offline_generation(monkeypatch):
+    monkeypatch.setattr(main.settings, "ollama_enabled", False)
+    monkeypatch.setattr(main.settings, "ollama_fallback_to_default", True)
+
+
+def _publish(headers):
+    return client.patch(f"/api/stories/{STORY_ID}/publish", headers=headers)
+
+
+def test_story_cannot_be_published_while_generating(fake_supabase, ngo_headers):
+    table = StoriesTable("generating")
+    fake_supabase(table)
+
+    response = _publish(ngo_headers)
+    assert response.status_code == 409
+    assert table.rows[0]["status"] == "generating"
+
+    asyncio.run(complete_story_generation(STORY_ID, PAYLOAD))
+    assert table.rows[0]["status"] == "draft"
+    assert _publish(ngo_headers).status_code == 200
+    assert table.rows[0]["status"] == "published"
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_background_completion_never_overwrites_a_changed_status(fake_supabase, monkeypatch, fail):
+    table = StoriesTable("published")
+    fake_supabase(table)
+    if fail:
+
+        async def broken(payload, story_id):
+            raise RuntimeError("generation crashed")
+
+        monkeypatch.setattr(main, "build_story_slides", broken)
+
+    asyncio.run(complete_story_generation(STORY_ID, PAYLOAD))
+    assert table.rows[0]["status"] == "published"
+
+
+def test_failed_story_cannot_be_published(fake_supabase, ngo_headers):
+    table = StoriesTable("failed")
+    fake_supabase(table)
+    assert _publish(ngo_headers).status_code == 409
+
+
+def test_republishing_is_still_a_no_op(fake_supabase, ngo_headers):
+    fake_supabase(StoriesTable("published"))
+    assert _publish(ngo_headers).status_code == 200
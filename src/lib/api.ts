@@ -1,4 +1,4 @@
-export type StoryStatus = "draft" | "published";
+export type StoryStatus = "generating" | "failed" | "draft" | "published";
 
 export interface Story {
   id: string;